@@ -0,0 +1,74 @@
+
+
+# STDLib
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, Any
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+# Each statement runs in a fresh interpreter, after "import py_financas": only the first access is measured
+ACESSOS = {
+    'import py_financas': '',
+    'py_financas.NotaCorretagem': 'py_financas.NotaCorretagem',
+    'py_financas.sinacor': 'py_financas.sinacor.parse_notas_corretagem',
+    'py_financas.fundos': 'py_financas.fundos.recupera_cadastros',
+    'py_financas.indices': 'py_financas.indices.recupera_indice',
+}
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# UTILS
+#######################################################################################################################
+
+
+def mede(nome:str, acesso:str, repeticoes:int) -> Dict[str,Any]:
+
+    # Median wall time of the import (and access) in fresh interpreters, measured inside the interpreter itself
+    codigo = ('import time; inicio = time.perf_counter(); import py_financas; ' + (acesso + '; ' if acesso else '')
+              + 'print(time.perf_counter() - inicio)')
+    ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ, os.environ.get('PYTHONPATH')])))
+    duracoes = [float(subprocess.run([sys.executable, '-c', codigo], env=ambiente, check=True,
+                                     capture_output=True, text=True).stdout)
+                for _ in range(repeticoes)]
+    medida = {'acesso': nome, 'segundos': statistics.median(duracoes), 'minimo': min(duracoes),
+              'repeticoes': repeticoes}
+    print(f'{nome:<28} {medida["segundos"] * 1000:>9.1f} ms (min {medida["minimo"] * 1000:.1f} ms)')
+    return medida
+
+
+# PAYLOAD
+#######################################################################################################################
+
+
+def main():
+    args = argparse.ArgumentParser(description='Benchmark of the startup time of "import py_financas", and of the '
+                                               'first access to each subpackage')
+    args.add_argument('-r', '--repeticoes', type=int, default=5, help='Fresh interpreters per measurement')
+    args.add_argument('--limite', type=float, default=0.05,
+                      help='Fail (exit 1) if the bare "import py_financas" takes longer than this, in seconds')
+    args.add_argument('--json', default=None, help='Write the measurements to this JSON file')
+    args = args.parse_args()
+
+    medidas = [mede(nome, acesso, args.repeticoes) for nome, acesso in ACESSOS.items()]
+
+    if args.json is not None:
+        with open(args.json, 'w') as fout:
+            json.dump({'parametros': vars(args), 'medidas': medidas}, fout, indent=2)
+
+    # The bare import must not pull the heavy dependencies (pandas, suds, pdfplumber, pydantic) back in
+    if medidas[0]['segundos'] > args.limite:
+        print(f'"import py_financas" took {medidas[0]["segundos"]:.3f} s, over the limit of {args.limite:.3f} s')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+
+
+# STDLib
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from typing import Dict, Callable, Any, Tuple
+
+# This package
+from py_financas.sinacor import parser
+from py_financas.sinacor.positions import _agrupa_operacoes, parse_posicoes_de_operacoes
+from py_financas.sinacor.vectorized import parse_posicoes_vetorizadas
+from sintetico import gera_paginas, escreve_pdf
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+PAGINAS_POR_PDF = 500
+
+
+# UTILS
+#######################################################################################################################
+
+
+def mede(nome:str, unidade:str, etapa:Callable[[], Any], contagem:Callable[[Any], int],
+         memoria:bool=True) -> Tuple[Dict[str,Any],Any]:
+
+    # Wall time, without tracing
+    inicio = time.perf_counter()
+    resultado = etapa()
+    duracao = time.perf_counter() - inicio
+    itens = contagem(resultado)
+
+    # Peak memory allocated by the stage, in a second (traced) run
+    pico = None
+    if memoria:
+        del resultado
+        tracemalloc.start()
+        resultado = etapa()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    medida = {'etapa': nome, 'unidade': unidade, 'itens': itens, 'segundos': duracao,
+              'itens_por_segundo': itens / duracao if duracao > 0 else float('inf'),
+              'pico_memoria_bytes': pico}
+    pico = '' if pico is None else f'{pico / 1024 / 1024:>10.1f} MB'
+    print(f'{nome:<28} {itens:>10} {unidade:<10} {duracao:>9.3f} s {medida["itens_por_segundo"]:>14,.0f} /s {pico}')
+    return medida, resultado
+
+
+# PAYLOAD
+#######################################################################################################################
+
+
+def main():
+    args = argparse.ArgumentParser(description='Offline benchmark of the stages of the SINACOR pipeline, '
+                                               'over synthetic Notas de Corretagem')
+    args.add_argument('-n', '--notas', type=int, default=2000)
+    args.add_argument('-f', '--folhas', type=int, default=2, help='Pages per nota')
+    args.add_argument('-o', '--operacoes', type=int, default=8, help='Operations per page')
+    args.add_argument('-s', '--seed', type=int, default=0)
+    args.add_argument('--pdf', action='store_true', help='Also write the pages as PDFs and measure read_pages')
+    args.add_argument('--workers', type=int, default=None, help='Workers of read_pages')
+    args.add_argument('--sem-memoria', action='store_true', help='Skip the (slower) peak memory measurements')
+    args.add_argument('--json', default=None, help='Write the measurements to this JSON file')
+    args = args.parse_args()
+    memoria = not args.sem_memoria
+
+    print(f'{args.notas} notas x {args.folhas} folhas x {args.operacoes} operacoes')
+    paginas = list(gera_paginas(args.notas, folhas=args.folhas, operacoes=args.operacoes, seed=args.seed))
+    medidas = []
+
+    # Text extraction from the PDF files
+    if args.pdf:
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivos = []
+            for inicio in range(0, len(paginas), PAGINAS_POR_PDF):
+                arquivos.append(os.path.join(diretorio, f'notas_{inicio:08d}.pdf'))
+                escreve_pdf(arquivos[-1], paginas[inicio:inicio + PAGINAS_POR_PDF])
+            medida, lidas = mede('read_pages', 'paginas', lambda: parser.read_pages(arquivos, workers=args.workers),
+                                 len, memoria)
+            medidas.append(medida)
+            paginas = lidas
+
+    # Location of the sections of the pages, and parsing of each section
+    validas = [(len(p.strip()) > 300) for p in paginas]
+    medida, secoes = mede('segment_pages', 'paginas', lambda: parser.segment_pages(paginas), len, memoria)
+    medidas.append(medida)
+    for nome, secao in [('parse_header', parser.parse_header),
+                        ('parse_body', parser.parse_body),
+                        ('parse_footer', parser.parse_footer)]:
+        medida, _ = mede(nome, 'paginas', lambda: secao(paginas, validas, secoes), lambda _: len(paginas), memoria)
+        medidas.append(medida)
+
+    # Join of the sections, and grouping of the pages of each nota as NotaCorretagem objects
+    medida, base = mede('_base_parse_notas_corretagem', 'paginas',
+                        lambda: parser._base_parse_notas_corretagem(paginas), lambda _: len(paginas), memoria)
+    medidas.append(medida)
+    notas_corretagem, header_columns, _, footer_columns = base
+    medida, notas = mede('_group_notas_corretagem', 'notas',
+                         lambda: parser._group_notas_corretagem(notas_corretagem, header_columns, footer_columns),
+                         len, memoria)
+    medidas.append(medida)
+
+    # Positions
+    operacoes = _agrupa_operacoes(notas)
+    total_operacoes = sum(len(ops) for ops in operacoes.values())
+    medida, _ = mede('parse_posicoes_de_operacoes', 'operacoes', lambda: parse_posicoes_de_operacoes(operacoes),
+                     lambda _: total_operacoes, memoria)
+    medidas.append(medida)
+    medida, _ = mede('parse_posicoes_vetorizadas', 'operacoes', lambda: parse_posicoes_vetorizadas(operacoes),
+                     lambda _: total_operacoes, memoria)
+    medidas.append(medida)
+
+    if args.json is not None:
+        with open(args.json, 'w') as fout:
+            json.dump({'parametros': vars(args), 'medidas': medidas}, fout, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
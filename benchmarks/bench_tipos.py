@@ -0,0 +1,104 @@
+
+
+# STDLib
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import date, timedelta
+from typing import Iterator
+
+# This package
+from py_financas.sinacor.types import Operacao, Posicao
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+TITULOS = ['PETR4', 'VALE3', 'ITUB4', 'BBDC4', 'ABEV3', 'WEGE3', 'MGLU3', 'BBAS3', 'B3SA3', 'RENT3']
+CNPJ = '02332886000104'
+
+
+# UTILS
+#######################################################################################################################
+
+
+def linhas_operacoes(n:int, seed:int=0) -> Iterator[dict]:
+    # Field values as produced by the parser: a new string object for each field of each operation
+    rnd = random.Random(seed)
+    for i in range(n):
+        quantidade = float(rnd.randint(1, 100) * 100)
+        preco = round(rnd.uniform(5, 50), 2)
+        yield dict(
+            _nota_numero=1000 + i // 20,
+            _nota_data_pregao=date(2020, 1, 1) + timedelta(days=i // 20),
+            _nota_corretora_cnpj=''.join(list(CNPJ)),
+            titulo=' {} '.format(rnd.choice(TITULOS)).strip(),
+            preco_ajuste=preco,
+            quantidade=quantidade,
+            valor_operacao_ajuste=round(preco * quantidade, 2),
+            compra_venda='compra',
+            debito_credito='debito',
+            tipo_mercado='VISTA'.lower(),
+            negociacao='BOVESPA'.lower(),
+            especificacao_titulo=('on'.upper(), 'nm'.upper(), ''.upper()),
+            observacao=' '.strip(),
+        )
+
+
+def mede(nome:str, construtor, n:int) -> list:
+
+    # Construction time, from field values already in memory
+    linhas = list(linhas_operacoes(n))
+    inicio = time.perf_counter()
+    objetos = [construtor(**linha) for linha in linhas]
+    duracao = time.perf_counter() - inicio
+    del linhas, objetos
+
+    # Memory retained by the objects, once the field values produced by the parser are discarded
+    tracemalloc.start()
+    objetos = [construtor(**linha) for linha in linhas_operacoes(n)]
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{nome:<28} {n / duracao:>12,.0f} ops/s {memoria / n:>10,.0f} B/op')
+    return objetos
+
+
+def aplica_operacoes(ops:list) -> float:
+    posicao = Posicao(
+        corretora=CNPJ, chave_operacao_abertura=ops[0].chave,
+        titulo=ops[0].titulo, especificacao_titulo=ops[0].especificacao_titulo,
+        observacao_titulo=ops[0].observacao, tipo_mercado=ops[0].tipo_mercado,
+        data_abertura=ops[0]._nota_data_pregao, data_fechamento=None,
+        quantidade=ops[0].quantidade, valor_unitario=ops[0].preco_ajuste
+    )
+    inicio = time.perf_counter()
+    for op in ops[1:]:
+        posicao.atualizar(op)
+    return time.perf_counter() - inicio
+
+
+# PAYLOAD
+#######################################################################################################################
+
+
+def main():
+    args = argparse.ArgumentParser(description='Construction time and memory of the Operacao objects')
+    args.add_argument('-n', '--operacoes', type=int, default=100000)
+    args = args.parse_args()
+
+    validadas = mede('Operacao (validated)', Operacao, args.operacoes)
+    confiaveis = mede('Operacao.confiavel (trusted)', Operacao.confiavel, args.operacoes)
+    assert validadas == confiaveis, 'TRUSTED OPERATIONS DIFFER FROM THE VALIDATED ONES'
+
+    # Moments of a position (MomentoPosicao), one per operation applied to it
+    ops = [op for op in confiaveis if op.titulo == TITULOS[0]]
+    duracao = aplica_operacoes(ops)
+    print(f'{"Posicao.atualizar":<28} {len(ops) / duracao:>12,.0f} ops/s')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+
+
+# STDLib
+import random
+from datetime import date, timedelta
+from typing import List, Iterator
+
+# This package
+from py_financas.sinacor.types import printreal
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+TITULOS = ['PETROBRAS', 'VALE', 'ITAUUNIBANCO', 'AMBEV S/A', 'BRADESCO', 'WEG', 'GERDAU', 'SUZANO S.A.',
+           'B3', 'LOCALIZA', 'MAGAZ LUIZA', 'BRASIL', 'ELETROBRAS', 'RUMO S.A.', 'EMBRAER', 'JBS']
+
+CABECALHO = (
+    'NOTA DE CORRETAGEM\n'
+    'Nr. nota Folha Data pregão\n'
+    '{numero} {folha} {data}\n'
+    'XP INVESTIMENTOS CCTVM S.A.\n'
+    'Av. Ataulfo de Paiva, 153 Sala 201 Leblon Rio de Janeiro RJ\n'
+    'Tel. 3003-3710 Fax: (21) 3265-3400\n'
+    'Internet: www.xpi.com.br SAC: 0800-77-20202\n'
+    'C.N.P.J.: 02.332.886/0001-04 Carta Patente: 000\n'
+    'Ouvidoria: Tel. 0800-722-3730\n'
+    'Cliente C.P.F./C.N.P.J/C.V.M./C.O.B.\n'
+    'FULANO DE TAL 000.000.000-00\n'
+    'Negócios realizados\n'
+    'Q Negociação C/V Tipo mercado Prazo Especificação do título Obs. (*) Quantidade Preço / Ajuste '
+    'Valor Operação / Ajuste D/C\n'
+)
+
+OPERACAO = 'BOVESPA {cv} VISTA {titulo} ON NM {quantidade} {preco} {valor} {dc}\n'
+
+RODAPE = (
+    'Resumo dos Negócios Resumo Financeiro\n'
+    'Debêntures 0,00 Clearing\n'
+    'Vendas à vista {vendas} Valor líquido das operações {liquido} {dc}\n'
+    'Compras à vista {compras} Taxa de liquidação 0,00 D\n'
+    'Opções - compras 0,00 Taxa de Registro 0,00 D\n'
+    'Opções - vendas 0,00 Total CBLC {liquido} {dc}\n'
+    'Operações à termo 0,00 Bolsa\n'
+    'Valor das oper. c/ títulos públ. (v. nom.) 0,00 Taxa de termo/opções 0,00 D\n'
+    'Valor das operações {total} Taxa A.N.A. 0,00 D\n'
+    'Emolumentos 0,00 D\n'
+    'Total Bovespa / Soma 0,00 D\n'
+    'Especificações diversas Corretagem / Despesas\n'
+    'Clearing 0,00 D\n'
+    'A coluna Q indica liquidação no Agente do Qualificado. Execução 0,00 D\n'
+    'Execução casa 0,00 D\n'
+    'ISS ( SÃO PAULO ) 0,00\n'
+    'Outras 0,00 D\n'
+    'Total corretagem / Despesas 0,00 D\n'
+    '(*) - Observações: A - Posição Futuro T - Liquidação pelo Bruto Líquido para {data_liquido} {liquido} {dc}\n'
+)
+
+CONTINUACAO = (
+    'Resumo dos Negócios Resumo Financeiro\n'
+    'C O N T I N U A . . .\n'
+)
+
+# pdfplumber drops the last line break of a page, required by the footer regex. A closing line keeps it
+ENCERRAMENTO = 'Nota de corretagem sintética\n'
+
+
+# PAGES
+#######################################################################################################################
+
+
+def gera_paginas(notas:int, folhas:int=1, operacoes:int=5, seed:int=0,
+                 data_inicial:date=date(2020, 1, 2), numero_inicial:int=1000) -> Iterator[str]:
+    # Text of the pages of synthetic Notas de Corretagem in the SINACOR format, as extracted by pdfplumber.
+    # One nota per trading day. Titles are only sold while held, and are not bought back on the day they are closed
+    rnd = random.Random(seed)
+    custodia = {}
+    data = data_inicial
+    for num_nota in range(notas):
+        data = data + timedelta(days=rnd.randint(1, 3))
+        fechados = set()
+        compras = vendas = 0.0
+        for folha in range(1, folhas + 1):
+            linhas = []
+            for _ in range(operacoes):
+                titulo = rnd.choice([t for t in TITULOS if t not in fechados])
+                preco = rnd.randint(1000, 5000) / 100
+                em_custodia = custodia.get(titulo, 0)
+                if (em_custodia > 0) and (rnd.random() < 0.45):
+                    quantidade = rnd.choice([em_custodia, min(em_custodia, rnd.randint(1, 10) * 100)])
+                    if (quantidade == em_custodia) and (len(fechados) >= len(TITULOS) - 1):
+                        quantidade = em_custodia // 2  # Keep a title open to be traded on this day
+                    cv, dc = 'V', 'C'
+                    custodia[titulo] = em_custodia - quantidade
+                    if custodia[titulo] == 0: fechados.add(titulo)
+                    vendas += round(quantidade * preco, 2)
+                else:
+                    quantidade = rnd.randint(1, 10) * 100
+                    cv, dc = 'C', 'D'
+                    custodia[titulo] = em_custodia + quantidade
+                    compras += round(quantidade * preco, 2)
+                linhas.append(OPERACAO.format(cv=cv, titulo=titulo, quantidade=printreal(quantidade)[:-3],
+                                              preco=printreal(preco), valor=printreal(quantidade * preco), dc=dc))
+
+            if folha < folhas: rodape = CONTINUACAO
+            else:
+                rodape = RODAPE.format(
+                    vendas=printreal(vendas), compras=printreal(compras), total=printreal(vendas + compras),
+                    liquido=printreal(abs(vendas - compras)), dc='C' if vendas >= compras else 'D',
+                    data_liquido=(data + timedelta(days=2)).strftime('%d/%m/%Y')
+                )
+            yield (CABECALHO.format(numero=numero_inicial + num_nota, folha=folha, data=data.strftime('%d/%m/%Y'))
+                   + ''.join(linhas) + rodape + ENCERRAMENTO)
+
+
+# PDF
+#######################################################################################################################
+
+
+def escreve_pdf(arquivo:str, paginas:List[str]):
+    # Minimal PDF, one line of Helvetica text per line of each page. Enough for pdfplumber to extract the same text
+    objetos = []
+
+    def adiciona(objeto:bytes) -> int:
+        objetos.append(objeto)
+        return len(objetos)
+
+    fonte = adiciona(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    id_paginas = len(objetos) + 1 + 2 * len(paginas)
+    filhos = []
+    for texto in paginas:
+        linhas = [
+            b'(' + linha.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)').encode('cp1252') + b") '"
+            for linha in texto.split('\n')
+        ]
+        conteudo = b'BT /F1 7 Tf 9 TL 20 830 Td ' + b' '.join(linhas) + b' ET'
+        id_conteudo = adiciona(b'<< /Length %d >>\nstream\n' % len(conteudo) + conteudo + b'\nendstream')
+        filhos.append(adiciona(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 %d 0 R >> >> >>' % (id_paginas, id_conteudo, fonte)
+        ))
+    adiciona(b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % f for f in filhos) + b'] /Count %d >>' % len(filhos))
+    catalogo = adiciona(b'<< /Type /Catalog /Pages %d 0 R >>' % id_paginas)
+
+    saida = bytearray(b'%PDF-1.4\n')
+    posicoes = []
+    for num, objeto in enumerate(objetos, 1):
+        posicoes.append(len(saida))
+        saida += b'%d 0 obj\n' % num + objeto + b'\nendobj\n'
+    xref = len(saida)
+    saida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+    saida += b''.join(b'%010d 00000 n \n' % p for p in posicoes)
+    saida += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, catalogo, xref)
+    with open(arquivo, 'wb') as fout:
+        fout.write(bytes(saida))
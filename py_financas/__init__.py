@@ -28,17 +28,31 @@ version = __version__
 VERSION = __version__
 
 
-# O sistema da Comissao de Valores Mobiliarios e tambem a unica fonte de informacoes sobre fundos
-from py_financas import cvm
-from py_financas import cvm as fundos
-from py_financas import cvm as fundos_mutuos
-
-# O sistema do Banco Central do Brasil - Sistema de Gestao de Series Temporais e tambem a unica fonte de indices
-from py_financas import bcb_sgs
-from py_financas import bcb_sgs as indices
-from py_financas import bcb_sgs as indexadores  # Indices tambem sao chamados "indexadores"
-
-# O SINACOR contém os modelos de dados utilizados em negociacoes
-from py_financas import sinacor
-from py_financas.sinacor.types import NotaCorretagem, Posicao, \
-    MomentoPosicao, Operacao, Corretora, Totais, Impostos, Custos
+# Os sub-pacotes (e suas dependencias, como pandas, suds e pdfplumber) sao importados apenas no primeiro acesso
+from py_financas._importacao_tardia import exporta_tardiamente
+__getattr__, __dir__ = exporta_tardiamente(__name__, globals(), {
+
+    # Constantes e configuracoes (como o relogio das datas padrao) compartilhadas pelos sub-pacotes
+    'constantes': ('py_financas.constantes', None),
+
+    # O sistema da Comissao de Valores Mobiliarios e tambem a unica fonte de informacoes sobre fundos
+    'cvm': ('py_financas.cvm', None),
+    'fundos': ('py_financas.cvm', None),
+    'fundos_mutuos': ('py_financas.cvm', None),
+
+    # O sistema do Banco Central do Brasil - Sistema de Gestao de Series Temporais e tambem a unica fonte de indices
+    'bcb_sgs': ('py_financas.bcb_sgs', None),
+    'indices': ('py_financas.bcb_sgs', None),
+    'indexadores': ('py_financas.bcb_sgs', None),  # Indices tambem sao chamados "indexadores"
+
+    # O SINACOR contém os modelos de dados utilizados em negociacoes
+    'sinacor': ('py_financas.sinacor', None),
+    'NotaCorretagem': ('py_financas.sinacor.types', 'NotaCorretagem'),
+    'Posicao': ('py_financas.sinacor.types', 'Posicao'),
+    'MomentoPosicao': ('py_financas.sinacor.types', 'MomentoPosicao'),
+    'Operacao': ('py_financas.sinacor.types', 'Operacao'),
+    'Corretora': ('py_financas.sinacor.types', 'Corretora'),
+    'Totais': ('py_financas.sinacor.types', 'Totais'),
+    'Impostos': ('py_financas.sinacor.types', 'Impostos'),
+    'Custos': ('py_financas.sinacor.types', 'Custos'),
+})
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+#
+# Copyright 2017 jfrfonseca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Importacao tardia (PEP 562) dos nomes expostos pelos pacotes, adiando a importacao das dependencias pesadas"""
+
+
+"""
+# IMPORTS
+"""
+
+
+# Biblioteca padrão
+import importlib
+import importlib.util
+
+
+"""
+# UTIL
+"""
+
+
+def exporta_tardiamente(nome_pacote, globais, exportacoes):
+
+    # As exportacoes relacionam cada nome exposto pelo pacote ao seu modulo e, se for o caso, ao atributo do modulo.
+    # Cada nome e importado apenas no primeiro acesso, e entao guardado no pacote (os acessos seguintes sao diretos).
+    # Os sub-modulos do pacote (como py_financas.sinacor.types) tambem sao importados no primeiro acesso
+    def __getattr__(nome):
+        if nome in exportacoes:
+            modulo, atributo = exportacoes[nome]
+        elif nome.isidentifier() and (not nome.startswith('__')) and \
+                (importlib.util.find_spec('{}.{}'.format(nome_pacote, nome)) is not None):
+            modulo, atributo = '{}.{}'.format(nome_pacote, nome), None
+        else:
+            raise AttributeError("module {!r} has no attribute {!r}".format(nome_pacote, nome))
+        valor = importlib.import_module(modulo)
+        if atributo is not None:
+            valor = getattr(valor, atributo)
+        globais[nome] = valor
+        return valor
+
+    def __dir__():
+        return sorted(set(globais) | set(exportacoes))
+
+    return __getattr__, __dir__
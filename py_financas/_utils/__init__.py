@@ -23,7 +23,10 @@
 """
 
 from py_financas._utils.unidades_brasileiras import ultimo_dia_util, e_dia_util
-from .autenticacao import inicializa_cliente_wsdl_cvm
-from .arquivos_zip import le_arquivo_zip_de_string
+from .calendario import agora, proximo_dia_util, desloca_dias_uteis, conta_dias_uteis, dias_uteis, lista_feriados
+from .autenticacao import inicializa_cliente_wsdl_cvm, obtem_sessao_cvm, SessaoCVM
+from .arquivos_zip import le_arquivo_zip_de_string, abre_arquivo_zip_de_string, \
+    itera_arquivos_zip_de_string, lista_arquivos_zip_de_string
 from py_financas._utils.autenticacao import LoggingWebServicePlugin
-from .unidades_brasileiras import normaliza_cnpj, normaliza_numerico
+from .downloads import baixa_arquivo, sessao_http
+from .unidades_brasileiras import normaliza_cnpj, normaliza_numerico, normaliza_cnpj_serie, normaliza_numerico_serie
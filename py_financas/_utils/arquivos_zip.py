@@ -24,6 +24,7 @@
 
 
 # Biblioteca padrão
+import io
 import zipfile
 import tempfile
 
@@ -33,8 +34,46 @@ import tempfile
 """
 
 
-def le_arquivo_zip_de_string(string_zipada):
-    arquivo_temporario = tempfile.TemporaryFile()
-    arquivo_temporario.write(string_zipada)
-    string_zipada_zip = zipfile.ZipFile(arquivo_temporario, "r")
-    return string_zipada_zip.read(string_zipada_zip.filelist[0].filename)
+def _abre_zip(string_zipada):
+
+    # Arquivos ja abertos (como os downloads em arquivos temporarios) sao lidos diretamente. Dos arquivos temporarios
+    # "spooled", lemos o arquivo interno (em memoria, ou no disco): ate o Python 3.10 eles nao tem o atributo
+    # seekable, exigido pelo zipfile na abertura de cada arquivo do ZIP
+    if isinstance(string_zipada, tempfile.SpooledTemporaryFile):
+        string_zipada = string_zipada._file
+    if hasattr(string_zipada, 'read'):
+        return zipfile.ZipFile(string_zipada, "r")
+
+    # O BytesIO compartilha o buffer dos bytes recebidos (sem copia), ate que seja escrito
+    if not isinstance(string_zipada, bytes):
+        string_zipada = bytes(string_zipada)
+    return zipfile.ZipFile(io.BytesIO(string_zipada), "r")
+
+
+def lista_arquivos_zip_de_string(string_zipada):
+    return [info.filename for info in _abre_zip(string_zipada).infolist() if not info.is_dir()]
+
+
+def itera_arquivos_zip_de_string(string_zipada):
+
+    # Percorremos todos os arquivos do ZIP, na ordem em que foram gravados, como objetos de arquivo.
+    # Cada arquivo e descompactado aos poucos, a medida que e lido
+    arquivo_zip = _abre_zip(string_zipada)
+    for info in arquivo_zip.infolist():
+        if info.is_dir(): continue
+        with arquivo_zip.open(info) as arquivo:
+            yield info.filename, arquivo
+
+
+def abre_arquivo_zip_de_string(string_zipada, nome_arquivo=None):
+
+    # Abrimos um arquivo do ZIP (por padrao, o primeiro) como um objeto de arquivo, descompactado aos poucos
+    arquivo_zip = _abre_zip(string_zipada)
+    if nome_arquivo is None:
+        nome_arquivo = arquivo_zip.filelist[0].filename
+    return arquivo_zip.open(nome_arquivo)
+
+
+def le_arquivo_zip_de_string(string_zipada, nome_arquivo=None):
+    with abre_arquivo_zip_de_string(string_zipada, nome_arquivo) as arquivo:
+        return arquivo.read()
@@ -24,21 +24,43 @@
 
 
 # Biblioteca padrão
+import re
 import logging
+import threading
 
 # Dependencias PIP
+from suds import WebFault
 from suds.client import Client
+from suds.cache import ObjectCache
 from suds.plugin import MessagePlugin
 
 # Este pacote
 from py_financas import constantes
 
 
+"""
+# CONSTANTES
+"""
+
+
+# Falhas do sistema WSDL CVM causadas pela sessao (expirada, invalida ou sem login), as unicas que justificam
+# refazer o login. As demais (parametros invalidos, dados inexistentes) sao repassadas imediatamente
+RGX_FALHA_SESSAO = re.compile(r'sess[aã]o|session|login|autentica|authentica|expir|n[aã]o autorizad|unauthori[sz]|'
+                              r'not authori[sz]|guid|idsessao', re.IGNORECASE)
+
+
 """
 # UTIL
 """
 
 
+def e_falha_de_sessao(falha):
+    # Verificamos o codigo e a mensagem da falha SOAP (ou o texto da excecao, se a falha nao tiver esses campos)
+    fault = getattr(falha, 'fault', None)
+    texto = ' '.join(str(getattr(fault, campo, '') or '') for campo in ('faultcode', 'faultstring'))
+    return RGX_FALHA_SESSAO.search(texto if texto.strip() != '' else str(falha)) is not None
+
+
 class LoggingWebServicePlugin(MessagePlugin):
     """
     Classe de compatibilidade SUDS-JURKO
@@ -64,27 +86,106 @@ class LoggingWebServicePlugin(MessagePlugin):
         return self.last_received_reply
 
 
-def inicializa_cliente_wsdl_cvm(usuario_cvm, senha_cvm):
-
-    log = logging.getLogger('py_financas:cvm')
-
-    try:
-
-        # Inicializamos um objeto de compatibilidade SUDS
-        logging_plugin = LoggingWebServicePlugin()
-
-        # Iniciamos um objeto cliente SOAP SUDS-JURKO
-        cliente = Client(constantes.wsdl_cvm, plugins=[logging_plugin])
+class SessaoCVM(object):
+    """
+    Sessao autenticada e reutilizavel com o sistema WSDL da CVM.
+    O WSDL e lido uma unica vez (e mantido em cache no disco entre processos), e o login e feito uma unica vez,
+    sendo refeito automaticamente quando uma chamada falha por expiracao da sessao.
+    Clientes SUDS nao sao seguros entre threads, entao cada thread usa seu proprio cliente, criado a partir do WSDL
+    em cache e com os headers de login compartilhados (o Client.clone do SUDS falha por recursao no Python 3)
+    """
 
-        # Executamos o metodo de login da CVM
-        cliente.service.Login(usuario_cvm, senha_cvm)
+    def __init__(self, usuario_cvm, senha_cvm):
+        self.usuario_cvm = usuario_cvm
+        self.senha_cvm = senha_cvm
+        self._cliente = None
+        self._logging_plugin = None
+        self._headers_login = None
+        self._geracao_login = 0
+        self._trava = threading.Lock()
+        self._locais = threading.local()
+
+    @staticmethod
+    def _novo_cliente(**opcoes):
+        # Cliente SOAP SUDS-JURKO com o WSDL em cache no disco, lido (ja processado) do cache apos a primeira vez
+        return Client(constantes.wsdl_cvm,
+                      cache=ObjectCache(constantes.diretorio_cache_wsdl, days=constantes.dias_cache_wsdl), **opcoes)
+
+    def _login(self):
+
+        log = logging.getLogger('py_financas:cvm')
+
+        try:
+
+            # Na primeira vez, iniciamos o objeto cliente SOAP SUDS-JURKO usado para o login
+            if self._cliente is None:
+                self._logging_plugin = LoggingWebServicePlugin()
+                self._cliente = self._novo_cliente(plugins=[self._logging_plugin])
+
+            # Executamos o metodo de login da CVM, e guardamos os headers de login
+            self._cliente.service.Login(self.usuario_cvm, self.senha_cvm)
+            self._headers_login = self._logging_plugin.last_received().getChildren()[0][0][0]
+            self._geracao_login += 1
+
+        except Exception as exp:
+            log.error("Excecao no login do sistema WSDL CVM! {}".format(exp))
+            raise exp
+
+    def renova_login(self, geracao_login=None):
+        # Refazemos o login, a menos que outra thread ja o tenha refeito desde a geracao informada
+        with self._trava:
+            if (geracao_login is None) or (geracao_login == self._geracao_login):
+                self._login()
+
+    def cliente(self):
+
+        # Fazemos o login, se ainda nao foi feito
+        if self._cliente is None:
+            self.renova_login(0)
+
+        # Criamos o cliente desta thread, e atualizamos seus headers se o login foi refeito
+        if getattr(self._locais, 'cliente', None) is None:
+            self._locais.cliente = self._novo_cliente(soapheaders=self._headers_login)
+            self._locais.geracao_login = self._geracao_login
+        elif self._locais.geracao_login != self._geracao_login:
+            self._locais.cliente.set_options(soapheaders=self._headers_login)
+            self._locais.geracao_login = self._geracao_login
+        return self._locais.cliente
+
+    def chama(self, operacao, *args):
+
+        # Executamos a operacao. Se falhar pela sessao (que pode ter expirado), tentamos mais uma vez, com um novo
+        # login. As demais falhas sao repassadas sem nova tentativa
+        cliente = self.cliente()
+        geracao_login = self._locais.geracao_login
+        try:
+            return getattr(cliente.service, operacao)(*args)
+        except WebFault as exp:
+            if not e_falha_de_sessao(exp):
+                raise exp
+            logging.getLogger('py_financas:cvm').debug(
+                "Falha na operacao {} do sistema WSDL CVM. Refazendo o login ({})".format(operacao, exp)
+            )
+            self.renova_login(geracao_login)
+            return getattr(self.cliente().service, operacao)(*args)
+
+
+# Sessoes ja autenticadas neste processo, por usuario
+_sessoes_cvm = {}
+_trava_sessoes_cvm = threading.Lock()
+
+
+def obtem_sessao_cvm(usuario_cvm, senha_cvm):
+
+    # Reutilizamos a sessao do usuario, se ja existir neste processo
+    with _trava_sessoes_cvm:
+        chave = (usuario_cvm, senha_cvm)
+        if chave not in _sessoes_cvm:
+            _sessoes_cvm[chave] = SessaoCVM(usuario_cvm, senha_cvm)
+        return _sessoes_cvm[chave]
 
-        # Setamos os headers de login na CVM
-        cliente.set_options(soapheaders=logging_plugin.last_received().getChildren()[0][0][0])
 
-        # Retornamos o cliente formado
-        return cliente
+def inicializa_cliente_wsdl_cvm(usuario_cvm, senha_cvm):
 
-    except Exception as exp:
-        log.error("Excecao no login do sistema WSDL CVM! {}".format(exp))
-        raise exp
+    # Retornamos o cliente da sessao compartilhada (para esta thread), ja autenticado
+    return obtem_sessao_cvm(usuario_cvm, senha_cvm).cliente()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+#
+# Copyright 2017 jfrfonseca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Calendario de dias uteis brasileiro (feriados nacionais e da B3), com aritmetica de dias uteis vetorizada"""
+
+
+"""
+# IMPORTS
+"""
+
+
+# Biblioteca padrao
+import datetime
+
+# Dependencias PIP
+import numpy as np
+
+# Este pacote
+from py_financas import constantes
+
+
+"""
+# CONSTANTES
+"""
+
+
+# Margem (em dias) do calendario alem das datas pedidas, suficiente para as rolagens ate o dia util mais proximo
+MARGEM_ROLAGEM = 31
+
+
+"""
+# UTIL
+"""
+
+
+# FERIADOS =============================================================================================================
+
+
+def pascoa(ano):
+
+    # Domingo de Pascoa no calendario gregoriano (algoritmo de Meeus/Jones/Butcher)
+    a, b, c = ano % 19, ano // 100, ano % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    mes = (h + l - 7 * m + 90) // 25
+    dia = (h + l - 7 * m + 33 * mes + 19) % 32
+    return datetime.date(ano, mes, dia)
+
+
+def feriados_do_ano(ano):
+
+    # Feriados nacionais de data fixa
+    feriados = [datetime.date(ano, mes, dia) for mes, dia in [
+        (1, 1),    # Confraternizacao Universal
+        (4, 21),   # Tiradentes
+        (5, 1),    # Dia do Trabalho
+        (9, 7),    # Independencia
+        (10, 12),  # Nossa Senhora Aparecida
+        (11, 2),   # Finados
+        (11, 15),  # Proclamacao da Republica
+        (12, 25),  # Natal
+    ]]
+    if ano >= 2024:
+        feriados.append(datetime.date(ano, 11, 20))  # Consciencia Negra (Lei 14.759/2023)
+
+    # Feriados moveis, calculados a partir da Pascoa: segunda e terca de Carnaval, Sexta-feira Santa e Corpus Christi
+    domingo_pascoa = pascoa(ano)
+    feriados.extend(domingo_pascoa + datetime.timedelta(days=dias) for dias in (-48, -47, -2, 60))
+
+    # Dias sem pregao na B3: vesperas de Natal e Ano Novo, e ate 2021 os feriados da cidade e do estado de Sao Paulo
+    feriados.extend([datetime.date(ano, 12, 24), datetime.date(ano, 12, 31)])
+    if ano <= 2021:
+        feriados.extend([datetime.date(ano, 1, 25), datetime.date(ano, 7, 9)])
+    if 2004 <= ano <= 2021:
+        feriados.append(datetime.date(ano, 11, 20))  # Consciencia Negra na cidade de Sao Paulo (Lei 13.707/2004)
+
+    return feriados
+
+
+def calendario_dias_uteis(*datas, margem_dias=0):
+
+    # O calendario (feriados ordenados, sem repeticoes nem fins de semana) e montado no primeiro uso. Se as datas
+    # pedidas (uma ou mais datas ou arrays de datas, com a margem em dias) estiverem fora dos anos cobertos, o
+    # intervalo de anos e ampliado e o calendario remontado, de modo que nenhuma data seja tratada sem os seus feriados
+    primeiro_ano, ultimo_ano = constantes.primeiro_ano_calendario, constantes.ultimo_ano_calendario
+    calendario = constantes.calendario_dias_uteis
+    dias = [np.atleast_1d(_como_dia(data)).ravel() for data in datas if data is not None]
+    dias = np.concatenate(dias) if dias else np.array([], dtype='datetime64[D]')
+    dias = dias[~np.isnat(dias)]
+    if len(dias) > 0:
+        margem = np.timedelta64(int(margem_dias), 'D')
+        primeiro_pedido = int((dias.min() - margem).astype('datetime64[Y]').astype(int)) + 1970
+        ultimo_pedido = int((dias.max() + margem).astype('datetime64[Y]').astype(int)) + 1970
+        if (primeiro_pedido < primeiro_ano) or (ultimo_pedido > ultimo_ano):
+            primeiro_ano, ultimo_ano = min(primeiro_pedido, primeiro_ano), max(ultimo_pedido, ultimo_ano)
+            calendario = None
+
+    # O calendario e montado em uma variavel local e publicado de uma vez, sem trava: outras threads continuam usando
+    # o calendario anterior (valido para as suas datas) ate a troca. O calendario e publicado antes dos anos que
+    # cobre, entao quem le os anos ja novos nunca encontra o calendario antigo
+    if calendario is None:
+        feriados = [feriado for ano in range(primeiro_ano, ultimo_ano + 1) for feriado in feriados_do_ano(ano)]
+        calendario = np.busdaycalendar(weekmask='1111100', holidays=np.array(feriados, dtype='datetime64[D]'))
+        constantes.calendario_dias_uteis = calendario
+        constantes.primeiro_ano_calendario, constantes.ultimo_ano_calendario = primeiro_ano, ultimo_ano
+    return calendario
+
+
+def lista_feriados(data_inicio=None, data_fim=None):
+
+    # Feriados (em dias de semana) do calendario, ordenados, no intervalo fechado [inicio, fim] se informado
+    todos = calendario_dias_uteis(data_inicio, data_fim).holidays
+    inicio = 0 if data_inicio is None else np.searchsorted(todos, _como_dia(data_inicio), side='left')
+    fim = len(todos) if data_fim is None else np.searchsorted(todos, _como_dia(data_fim), side='right')
+    return todos[inicio:fim]
+
+
+# RELOGIO ==============================================================================================================
+
+
+def agora():
+    # Data e hora atuais, do relogio configurado, avaliadas a cada chamada (e nao na importacao do pacote)
+    return (constantes.relogio or datetime.datetime.now)()
+
+
+# CONVERSOES ===========================================================================================================
+
+
+def _e_escalar(data):
+    # Datas e datetimes do Python (e Timestamps do PANDAS, que sao datetimes) sao tratados um a um
+    return isinstance(data, datetime.date)
+
+
+def _como_dia(datas):
+
+    # Convertemos datas, datetimes (sem horario) ou arrays/series de datas em datetime64 com resolucao de dias
+    if isinstance(datas, datetime.datetime):
+        datas = datas.date()
+    if _e_escalar(datas):
+        return np.datetime64(datas, 'D')
+    return np.asarray(datas).astype('datetime64[D]')
+
+
+def _desloca_como(data, dia):
+    # Deslocamos a data original ate o dia calculado, preservando seu tipo (e o horario, se for um datetime)
+    return data + datetime.timedelta(days=int((dia - _como_dia(data)) // np.timedelta64(1, 'D')))
+
+
+"""
+# PAYLOAD
+"""
+
+
+def e_dia_util(data=None):
+
+    # Por padrao, a data atual (do relogio configurado), avaliada a cada chamada
+    if data is None:
+        data = agora()
+
+    # Uma data, ou um array de datas (neste caso, retornamos um array de booleanos)
+    resultado = np.is_busday(_como_dia(data), busdaycal=calendario_dias_uteis(data))
+    return bool(resultado) if _e_escalar(data) else resultado
+
+
+def ultimo_dia_util(data_inicial=None):
+
+    # Por padrao, a data atual (do relogio configurado), avaliada a cada chamada
+    if data_inicial is None:
+        data_inicial = agora()
+
+    # A propria data, se for dia util, ou o dia util anterior. Os feriados sao localizados por busca binaria
+    dia = np.busday_offset(_como_dia(data_inicial), 0, roll='backward',
+                           busdaycal=calendario_dias_uteis(data_inicial, margem_dias=MARGEM_ROLAGEM))
+    return _desloca_como(data_inicial, dia) if _e_escalar(data_inicial) else dia
+
+
+def proximo_dia_util(data_inicial=None):
+
+    # Por padrao, a data atual (do relogio configurado), avaliada a cada chamada
+    if data_inicial is None:
+        data_inicial = agora()
+
+    # A propria data, se for dia util, ou o dia util seguinte
+    dia = np.busday_offset(_como_dia(data_inicial), 0, roll='forward',
+                           busdaycal=calendario_dias_uteis(data_inicial, margem_dias=MARGEM_ROLAGEM))
+    return _desloca_como(data_inicial, dia) if _e_escalar(data_inicial) else dia
+
+
+def desloca_dias_uteis(datas, dias, rolagem='following'):
+
+    # Deslocamos as datas (ou arrays de datas) em um numero de dias uteis, como o numpy.busday_offset. Datas que nao
+    # sao dias uteis sao primeiro roladas conforme a rolagem ('following', 'preceding', 'forward', 'backward', ...)
+    # A margem do calendario cobre o maior deslocamento (com folga para fins de semana e feriados)
+    margem = 2 * int(np.max(np.abs(dias))) + MARGEM_ROLAGEM if np.size(dias) > 0 else MARGEM_ROLAGEM
+    resultado = np.busday_offset(_como_dia(datas), dias, roll=rolagem, busdaycal=calendario_dias_uteis(datas, margem_dias=margem))
+    return _desloca_como(datas, resultado) if _e_escalar(datas) and np.ndim(resultado) == 0 else resultado
+
+
+def conta_dias_uteis(data_inicio, data_fim):
+
+    # Numero de dias uteis entre as datas (ou arrays de datas), incluindo o inicio e excluindo o fim (como os "dias
+    # uteis" da ANBIMA). Se o fim for anterior ao inicio, a contagem e negativa
+    resultado = np.busday_count(_como_dia(data_inicio), _como_dia(data_fim),
+                                busdaycal=calendario_dias_uteis(data_inicio, data_fim))
+    return int(resultado) if np.ndim(resultado) == 0 else resultado
+
+
+def dias_uteis(data_inicio, data_fim):
+
+    # Array com os dias uteis do intervalo, incluindo as datas de inicio e fim
+    dias = np.arange(_como_dia(data_inicio), _como_dia(data_fim) + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+    return dias[np.is_busday(dias, busdaycal=calendario_dias_uteis(dias))]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+#
+# Copyright 2017 jfrfonseca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Operacoes de download de documentos por HTTP, com conexoes reaproveitadas, retentativas e retomada"""
+
+
+"""
+# IMPORTS
+"""
+
+
+# Biblioteca padrão
+import re
+import time
+import logging
+import tempfile
+import threading
+
+# Dependencias PIP
+import requests
+from requests.adapters import HTTPAdapter
+
+
+"""
+# CONFIG
+"""
+
+
+# Conexoes mantidas abertas por servidor, e tamanho dos blocos lidos de cada resposta
+conexoes_por_servidor = 16
+tamanho_bloco = 1024 * 1024
+
+# Tamanho maximo de um download mantido em memoria. Acima disso, o arquivo temporario passa para o disco
+tamanho_maximo_memoria = 32 * 1024 * 1024
+
+# Retentativas de downloads interrompidos, com espera (em segundos) dobrada a cada nova tentativa
+tentativas = 5
+espera_inicial = 1.0
+timeout = (10, 60)
+
+# Erros que justificam uma nova tentativa
+ERROS_TRANSITORIOS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+# Cabecalho Content-Range das respostas parciais (206) e das retomadas recusadas (416)
+RGX_CONTENT_RANGE = re.compile(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)')
+
+
+"""
+# UTIL
+"""
+
+
+_sessao_http = None
+_trava_sessao_http = threading.Lock()
+
+
+def sessao_http():
+
+    # Sessao HTTP unica no processo, cujo pool de conexoes e compartilhado por todos os downloads (e threads)
+    global _sessao_http
+    with _trava_sessao_http:
+        if _sessao_http is None:
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=conexoes_por_servidor, pool_maxsize=conexoes_por_servidor)
+            sessao.mount('http://', adaptador)
+            sessao.mount('https://', adaptador)
+            _sessao_http = sessao
+        return _sessao_http
+
+
+def _le_content_range(resposta):
+    # Inicio e tamanho total do cabecalho Content-Range da resposta (None, se ausentes ou desconhecidos)
+    encontrado = RGX_CONTENT_RANGE.match(resposta.headers.get('Content-Range', '').strip())
+    if encontrado is None:
+        return None, None
+    inicio, total = encontrado.groups()
+    return (int(inicio) if inicio is not None else None), (int(total) if total != '*' else None)
+
+
+def _recomeca(arquivo):
+    # Descarta o que ja foi recebido do documento, e retorna o novo numero de bytes recebidos
+    arquivo.seek(0)
+    arquivo.truncate()
+    return 0
+
+
+def baixa_arquivo(url):
+
+    log = logging.getLogger('py_financas:downloads')
+
+    # O documento e gravado aos poucos em um arquivo temporario, que fica em memoria enquanto for pequeno
+    arquivo = tempfile.SpooledTemporaryFile(max_size=tamanho_maximo_memoria)
+    recebido = 0
+    tentativa = 0
+
+    while True:
+        try:
+
+            # Se parte do documento ja foi recebida, pedimos apenas o restante (retomada). O documento e pedido sem
+            # compressao, de modo que os bytes contados sejam os mesmos bytes do intervalo pedido ao servidor
+            retomavel = True
+            cabecalhos = {'Accept-Encoding': 'identity'}
+            if recebido > 0:
+                cabecalhos['Range'] = 'bytes={}-'.format(recebido)
+            with sessao_http().get(url, headers=cabecalhos, stream=True, timeout=timeout) as resposta:
+
+                # Retomada recusada (416) de um documento que ja estava completo: o download terminou
+                if (recebido > 0) and (resposta.status_code == 416):
+                    if _le_content_range(resposta)[1] == recebido:
+                        arquivo.seek(0)
+                        return arquivo
+                    recebido = _recomeca(arquivo)
+                    raise requests.ConnectionError("Retomada de {} recusada (416). Recomecando do zero".format(url))
+
+                if resposta.status_code in STATUS_TRANSITORIOS:
+                    raise requests.HTTPError("Status HTTP {}".format(resposta.status_code), response=resposta)
+                resposta.raise_for_status()
+
+                # Se o servidor nao aceitou a retomada, ele enviou o documento inteiro: recomecamos do zero.
+                # Se enviou outro trecho do documento, o descartamos e recomecamos do zero na proxima tentativa
+                if (recebido > 0) and (resposta.status_code != 206):
+                    recebido = _recomeca(arquivo)
+                elif (recebido > 0) and (_le_content_range(resposta)[0] != recebido):
+                    recebido = _recomeca(arquivo)
+                    raise requests.ConnectionError("Trecho inesperado ({}) na retomada de {}".format(
+                        resposta.headers.get('Content-Range'), url))
+
+                # Servidores que comprimem o documento mesmo assim nao permitem retomada: os bytes contados sao os
+                # descomprimidos. Uma interrupcao recomeca o download do zero
+                retomavel = resposta.headers.get('Content-Encoding', 'identity').strip().lower() in ('', 'identity')
+
+                for bloco in resposta.iter_content(chunk_size=tamanho_bloco):
+                    arquivo.write(bloco)
+                    recebido += len(bloco)
+
+            # Download completo. Retornamos o arquivo, posicionado no inicio
+            arquivo.seek(0)
+            return arquivo
+
+        except (ERROS_TRANSITORIOS + (requests.HTTPError,)) as exp:
+
+            if not retomavel:
+                recebido = _recomeca(arquivo)
+
+            # Erros definitivos (como 404) e a ultima tentativa sao repassados
+            tentativa += 1
+            transitorio = not isinstance(exp, requests.HTTPError) or \
+                ((exp.response is not None) and (exp.response.status_code in STATUS_TRANSITORIOS))
+            if (not transitorio) or (tentativa >= tentativas):
+                log.error("Excecao no download de {}! {}".format(url, exp))
+                arquivo.close()
+                raise exp
+
+            espera = espera_inicial * (2 ** (tentativa - 1))
+            log.warning("Download de {} interrompido em {} bytes ({}). Nova tentativa em {}s".format(
+                url, recebido, exp, espera))
+            time.sleep(espera)
@@ -23,7 +23,9 @@
 """
 
 
-import datetime
+# Dependencias PIP
+import numpy as np
+import pandas as pd
 
 
 """
@@ -42,17 +44,40 @@ def normaliza_numerico(string_nao_normalizada):
     return string_nao_normalizada.replace(",", ".")
 
 
-# DATAS ================================================================================================================
+def _normaliza_cnpj_valor(valor):
+    # Strings sao normalizadas e CNPJ lidos como numeros inteiros sao completados com zeros. Nulos sao mantidos
+    if isinstance(valor, str):
+        return normaliza_cnpj(valor)
+    if isinstance(valor, (int, np.integer)) and not isinstance(valor, bool):
+        return str(valor).zfill(14)
+    return valor
+
 
+def normaliza_cnpj_serie(serie_nao_normalizada):
+    # Versao de normaliza_cnpj para uma coluna inteira de um dataframe. Cada CNPJ se repete em muitas linhas (um
+    # informe por dia), entao normalizamos somente os valores unicos, e os distribuimos pelas linhas
+    codigos, valores_unicos = pd.factorize(serie_nao_normalizada.to_numpy(dtype=object))
+    normalizados = np.array([_normaliza_cnpj_valor(valor) for valor in valores_unicos.tolist()] + [np.nan], dtype=object)
+    return pd.Series(normalizados[codigos], index=serie_nao_normalizada.index, name=serie_nao_normalizada.name)
 
-def ultimo_dia_util(data_inicial=datetime.datetime.today()):
 
-    # Verificamos se a data passada e um dia util. Se nao, subtraimos um dia ate que seja
-    while not e_dia_util(data_inicial):
-        data_inicial -= datetime.timedelta(days=1)
+def normaliza_numerico_serie(serie_nao_normalizada):
+    # Converte uma coluna de numeros em notacao brasileira ("1.234,56") em uma coluna numerica. Colunas mistas
+    # (strings e numeros) sao aceitas. Strings que nao sao numeros (como "N/A") levantam ValueError
+    if (len(serie_nao_normalizada) == 0) or pd.api.types.is_numeric_dtype(serie_nao_normalizada):
+        return pd.to_numeric(serie_nao_normalizada)
+    # Somente strings sao convertidas (numeros e nulos sao mantidos). Os pontos sao separadores de milhar quando o
+    # numero tem virgula decimal
+    valores = [
+        ((float(valor.replace('.', '').replace(',', '.')) if ',' in valor else float(valor))
+         if isinstance(valor, str) else valor)
+        for valor in serie_nao_normalizada.tolist()
+    ]
+    return pd.to_numeric(pd.Series(valores, index=serie_nao_normalizada.index, name=serie_nao_normalizada.name))
 
-    return data_inicial
+
+# DATAS ================================================================================================================
 
 
-def e_dia_util(data=datetime.datetime.today()):
-    return data.weekday() < 5
+# As operacoes de datas usam o calendario de dias uteis, com os feriados nacionais e da B3
+from .calendario import ultimo_dia_util, proximo_dia_util, e_dia_util
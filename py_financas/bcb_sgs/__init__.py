@@ -25,3 +25,4 @@
 
 # Este pacote
 from .recupera_indice import recupera_indice, normaliza_codigo_indice
+from .armazem_series import ArmazemSeriesSGS
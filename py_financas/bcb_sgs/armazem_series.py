@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+#
+# Copyright 2017 jfrfonseca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Armazenamento local (SQLite) de series do sistema BCB SGS, com registro dos intervalos de datas ja recuperados"""
+
+
+"""
+# IMPORTS
+"""
+
+
+# Biblioteca padrão
+import os
+import sqlite3
+import datetime
+from contextlib import contextmanager
+
+# Dependencias PIP
+import pandas as pd
+
+# Este pacote
+from py_financas import _utils
+
+
+"""
+# UTIL
+"""
+
+
+def _como_data(data):
+    # Normalizamos datas e datetimes como datas (sem horario)
+    return data.date() if isinstance(data, datetime.datetime) else data
+
+
+UM_DIA = datetime.timedelta(days=1)
+
+
+class ArmazemSeriesSGS(object):
+    """
+    Armazem local de valores de series do BCB SGS, em um arquivo SQLite.
+    Alem dos valores, registra os intervalos de datas ja recuperados de cada serie, de modo que apenas os intervalos
+    faltantes (como os dias mais recentes) precisem ser buscados no webservice.
+    Os dias sem valores dos ultimos dias_publicacao dias nao sao registrados, pois podem ainda nao ter sido publicados
+    """
+
+    def __init__(self, arquivo, dias_publicacao=45):
+        self.arquivo = os.path.expanduser(arquivo)
+        self.dias_publicacao = dias_publicacao
+        diretorio = os.path.dirname(self.arquivo)
+        if diretorio != '':
+            os.makedirs(diretorio, exist_ok=True)
+        with self._conecta() as conexao:
+            conexao.execute('CREATE TABLE IF NOT EXISTS valores ('
+                            'codigo INTEGER, data TEXT, valor TEXT, PRIMARY KEY (codigo, data))')
+            conexao.execute('CREATE TABLE IF NOT EXISTS intervalos (codigo INTEGER, inicio TEXT, fim TEXT)')
+
+    def __repr__(self): return '<ArmazemSeriesSGS {}>'.format(self.arquivo)
+    def __str__(self): return self.__repr__()
+
+    @contextmanager
+    def _conecta(self):
+        # Uma conexao (e uma transacao) por operacao, de modo que o armazem pode ser usado por varias threads
+        conexao = sqlite3.connect(self.arquivo, timeout=30)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def intervalos(self, codigo):
+        with self._conecta() as conexao:
+            return [(datetime.date.fromisoformat(inicio), datetime.date.fromisoformat(fim))
+                    for inicio, fim in conexao.execute('SELECT inicio, fim FROM intervalos WHERE codigo = ? '
+                                                       'ORDER BY inicio', (int(codigo),))]
+
+    def faltantes(self, codigo, data_inicio, data_fim):
+
+        # Percorremos os intervalos ja recuperados, em ordem, e listamos os trechos de [inicio, fim] nao cobertos
+        inicio, fim = _como_data(data_inicio), _como_data(data_fim)
+        faltantes = []
+        for inicio_armazenado, fim_armazenado in self.intervalos(codigo):
+            if fim_armazenado < inicio:
+                continue
+            if inicio_armazenado > fim:
+                break
+            if inicio_armazenado > inicio:
+                faltantes.append((inicio, inicio_armazenado - UM_DIA))
+            inicio = max(inicio, fim_armazenado + UM_DIA)
+        if inicio <= fim:
+            faltantes.append((inicio, fim))
+        return faltantes
+
+    def grava(self, codigo, data_inicio, data_fim, valores):
+
+        # Gravamos os valores recuperados (no formato do webservice), substituindo os ja existentes. As datas sao
+        # lidas da mesma forma que na recuperacao sem armazem
+        codigo = int(codigo)
+        datas = pd.to_datetime([v['DATA'] for v in valores], dayfirst=True)
+        linhas = [(codigo, data.date().isoformat(), v['VALOR']) for data, v in zip(datas, valores)]
+
+        # Registramos o intervalo como recuperado, mesmo sem valores (dias sem publicacao, ou antes do inicio da serie).
+        # Apenas os dias recentes apos o ultimo valor recebido ficam de fora: podem ainda nao ter sido publicados, e
+        # serao buscados novamente na proxima atualizacao
+        inicio, fim = _como_data(data_inicio), _como_data(data_fim)
+        limite_publicacao = _como_data(_utils.agora()) - datetime.timedelta(days=self.dias_publicacao)
+        if fim > limite_publicacao:
+            ultimo_valor = max(datas).date() if len(linhas) > 0 else inicio - UM_DIA
+            fim = max(ultimo_valor, min(fim, limite_publicacao))
+
+        with self._conecta() as conexao:
+            if len(linhas) > 0:
+                conexao.executemany('INSERT OR REPLACE INTO valores (codigo, data, valor) VALUES (?, ?, ?)', linhas)
+            if inicio > fim:
+                return
+
+            # Unimos o novo intervalo aos intervalos sobrepostos ou adjacentes ja registrados
+            intervalos = [(datetime.date.fromisoformat(i), datetime.date.fromisoformat(f)) for i, f in conexao.execute(
+                'SELECT inicio, fim FROM intervalos WHERE codigo = ?', (codigo,))] + [(inicio, fim)]
+            unidos = []
+            for inicio_intervalo, fim_intervalo in sorted(intervalos):
+                if unidos and (inicio_intervalo <= unidos[-1][1] + UM_DIA):
+                    unidos[-1] = (unidos[-1][0], max(unidos[-1][1], fim_intervalo))
+                else:
+                    unidos.append((inicio_intervalo, fim_intervalo))
+            conexao.execute('DELETE FROM intervalos WHERE codigo = ?', (codigo,))
+            conexao.executemany('INSERT INTO intervalos (codigo, inicio, fim) VALUES (?, ?, ?)',
+                                [(codigo, i.isoformat(), f.isoformat()) for i, f in unidos])
+
+    def le(self, codigo, data_inicio, data_fim):
+
+        # Lemos os valores armazenados no intervalo, no mesmo formato retornado pelo webservice
+        with self._conecta() as conexao:
+            return [{'DATA': datetime.date.fromisoformat(data).strftime('%d/%m/%Y'), 'VALOR': valor}
+                    for data, valor in conexao.execute(
+                        'SELECT data, valor FROM valores WHERE codigo = ? AND data BETWEEN ? AND ? ORDER BY data',
+                        (int(codigo), _como_data(data_inicio).isoformat(), _como_data(data_fim).isoformat()))]
@@ -24,10 +24,20 @@
 
 
 # Biblioteca padrão
+import os
+import json
+import time
 import difflib
+import logging
+import datetime
+import threading
+from importlib.resources import files
+from concurrent.futures import ThreadPoolExecutor
 
 # Dependencias PIP
 from suds.client import Client, WebFault  # Recuperacao de dados
+from suds.cache import ObjectCache  # Recuperacao de dados
+from suds.transport import TransportError  # Recuperacao de dados
 import xmltodict  # Parsing dos dados
 import numpy as np  # Parsing dos dados
 import pandas as pd  # Parsing dos dados
@@ -35,6 +45,7 @@ from unidecode import unidecode  # Parsing dos dados
 
 # Este pacote
 from py_financas import constantes, _utils
+from .armazem_series import ArmazemSeriesSGS
 
 
 """
@@ -54,106 +65,298 @@ def normaliza_xml(xml):
         return resultado
 
 
-def _inicializa_tabela_bcb():
+def normaliza_xml_series(xml, lista_codigos):
+
+    # Parseamos o XML de uma requisicao de varias series, e normalizamos as series como uma lista
+    series = xmltodict.parse(xml)['SERIES']['SERIE']
+    if not isinstance(series, list):
+        series = [series]
+
+    # Separamos os valores de cada serie pelo seu codigo (atributo ID), ou pela ordem das series, se nao houver ID
+    resultado = {}
+    for posicao, serie in enumerate(series):
+        serie = serie or {}
+        codigo = int(serie['@ID']) if '@ID' in serie else lista_codigos[posicao]
+        valores = serie.get('ITEM') or []
+        resultado[codigo] = valores if isinstance(valores, list) else [valores]
+    return resultado
+
+
+def _trigramas(texto):
+
+    # Trigramas do texto, com espacos nas bordas, de modo que mesmo textos curtos tenham trigramas
+    texto = '  {} '.format(texto)
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceNomesBCB(object):
+    """
+    Indice dos nomes (apelidos) dos codigos da tabela BCB, montado uma unica vez.
+    Nomes exatos sao encontrados por um dicionario apelido -> codigo. Nomes aproximados sao comparados
+    (com o SequenceMatcher do difflib) apenas com os apelidos que compartilham algum trigrama com o nome buscado
+    """
+
+    def __init__(self, tabela_codigos):
+
+        # Posicao de cada codigo na tabela (lista de pares codigo, apelidos): havendo mais de um codigo possivel,
+        # vale o primeiro da tabela
+        self.ordem = {int(codigo): posicao for posicao, (codigo, _) in enumerate(tabela_codigos)}
+        self.codigos_por_apelido = {}
+        self.apelidos_por_trigrama = {}
+        for codigo, apelidos in tabela_codigos:
+            for apelido in apelidos:
+                self.codigos_por_apelido.setdefault(apelido, []).append(int(codigo))
+                for trigrama in _trigramas(apelido):
+                    self.apelidos_por_trigrama.setdefault(trigrama, set()).add(apelido)
+
+    def __repr__(self): return '<IndiceNomesBCB [{}|{}]>'.format(len(self.ordem), len(self.codigos_por_apelido))
+    def __str__(self): return self.__repr__()
+
+    def busca(self, nome_indice, proximidade):
+
+        # Nome exato
+        if nome_indice in self.codigos_por_apelido:
+            return self.codigos_por_apelido[nome_indice][0]
+
+        # Nome aproximado: comparamos os candidatos com os mesmos filtros (do mais rapido ao mais lento)
+        # do difflib.get_close_matches, e retornamos o primeiro codigo da tabela com algum apelido parecido o bastante
+        candidatos = set()
+        for trigrama in _trigramas(nome_indice):
+            candidatos.update(self.apelidos_por_trigrama.get(trigrama, ()))
+        comparador = difflib.SequenceMatcher()
+        comparador.set_seq2(nome_indice)
+        codigos = []
+        for apelido in candidatos:
+            comparador.set_seq1(apelido)
+            if (comparador.real_quick_ratio() >= proximidade) and (comparador.quick_ratio() >= proximidade) \
+                    and (comparador.ratio() >= proximidade):
+                codigos.extend(self.codigos_por_apelido[apelido])
+        return min(codigos, key=self.ordem.get) if codigos else None
+
+
+# Tabela de codigos BCB, editavel (CSV), e compilada (JSON, com os apelidos ja normalizados), distribuida no pacote
+ARQUIVO_TABELA_BCB = 'tabela_de_codigos_sistemas_web_banco_central_do_brasil.csv'
+ARQUIVO_TABELA_BCB_COMPILADA = 'tabela_de_codigos_bcb.json'
+
+
+def compila_tabela_bcb(arquivo_csv=None, arquivo_json=None):
+
+    # Por padrao, compilamos a tabela CSV do pacote para o arquivo JSON do pacote. Deve ser executada sempre que a
+    # tabela CSV for alterada
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    arquivo_csv = arquivo_csv or os.path.join(diretorio, ARQUIVO_TABELA_BCB)
+    arquivo_json = arquivo_json or os.path.join(diretorio, ARQUIVO_TABELA_BCB_COMPILADA)
 
     # Inicializamos um dataframe com a tabela de codigos BCB
-    df = pd.read_csv('../py_financas/bcb_sgs/tabela_de_codigos_sistemas_web_banco_central_do_brasil.csv',
-                     sep=',', header=None, index_col=0).T
+    df = pd.read_csv(arquivo_csv, sep=',', header=None, index_col=0).T
 
     # Montamos diversas variacoes da grafia das strings passadas no arquov CSV
-    result = {}
+    result = []
     for coluna in df.columns:
 
         # Removemos a calitalizacao e os acentos, elementos duplicados e valores nulos, exportando como tipo lista
-        result[coluna] = df[coluna].dropna().apply(lambda stri: unidecode(stri.lower())).drop_duplicates().tolist()
+        result.append([int(coluna), df[coluna].dropna().apply(lambda stri: unidecode(stri.lower()))
+                                                         .drop_duplicates().tolist()])
 
-    # Salvamos o resultado num DataFrame do modulo de constantes, apos parsear o dicionario acima
-    constantes.df_tabela_codigos_bcb = pd.DataFrame().from_dict(result, orient='index').T.fillna(value=np.NaN)
+    # Gravamos a lista de pares (codigo, apelidos), na ordem da tabela, um par por linha
+    with open(arquivo_json, 'w') as fout:
+        fout.write('[\n' + ',\n'.join(json.dumps(par) for par in result) + '\n]\n')
+
+
+def _inicializa_tabela_bcb():
+
+    # Lemos a tabela de codigos BCB ja compilada, dos dados do pacote (funciona de qualquer diretorio de trabalho)
+    tabela_codigos = json.loads(files(__package__).joinpath(ARQUIVO_TABELA_BCB_COMPILADA).read_text())
+
+    # Salvamos a tabela num DataFrame do modulo de constantes, e o indice de nomes construido a partir dela
+    constantes.df_tabela_codigos_bcb = pd.DataFrame().from_dict(
+        {codigo: apelidos for codigo, apelidos in tabela_codigos}, orient='index').T.fillna(value=np.nan)
+    constantes.indice_nomes_bcb = IndiceNomesBCB(tabela_codigos)
 
 
 def normaliza_codigo_indice(nome_indice):
 
-    # Inicializamos a tabela de codigos BCB, caso a mesma ainda nao exista
-    if constantes.df_tabela_codigos_bcb is None:
+    # Inicializamos a tabela de codigos BCB (e seu indice de nomes), caso a mesma ainda nao exista
+    if constantes.indice_nomes_bcb is None:
         _inicializa_tabela_bcb()
 
-    # Se o nome do indice for um dos codigos da tabela
-    if nome_indice in constantes.df_tabela_codigos_bcb.columns:
+    # Se o nome do indice for um dos codigos da tabela, normalizamos o seu tipo como inteiro
+    if nome_indice in constantes.indice_nomes_bcb.ordem:
+        return int(nome_indice)
 
-        # Normalizamos o tipo do codigo indice como inteiro
-        codigo_indice = int(nome_indice)
+    # Formatamos o nome passado como uma string sem capitalizacao nem acentos, e o buscamos no indice de nomes
+    nome_indice = unidecode(str(nome_indice).lower())
+    codigo_indice = constantes.indice_nomes_bcb.busca(nome_indice, constantes.proximidade_nome_indice)
+    if codigo_indice is None:
 
-    else:
-        # Formatamos o nome passado como uma string sem capitalizacao nem acentos
-        nome_indice = unidecode(str(nome_indice).lower())
-        try:
-            # Identificamos a primeira coluna do dataframe que contenha o nome exato informado
-            codigo_indice = int(next(coluna for coluna in constantes.df_tabela_codigos_bcb.columns
-                                     if nome_indice in constantes.df_tabela_codigos_bcb[coluna]))
-        except StopIteration:
-            # No caso de termos um erro de fim de iteração, nenhuma das colunas do dataframe tem um match exato :(
-            # Portanto, sera necessario fazer um match aproximado
-            try:
-                codigo_indice = int(next(
-                    coluna for coluna in constantes.df_tabela_codigos_bcb.columns
-
-                    # Recuperamos a primeira coluna que tenha algum elemento parecido o bastante com o nome requisitado
-                    if len(difflib.get_close_matches(nome_indice,
-                                                     constantes.df_tabela_codigos_bcb[coluna].dropna(),
-                                                     n=1, cutoff=constantes.proximidade_nome_indice)) > 0
-                ))
-            except StopIteration:
-
-                # Nao conseguimos encontrar o codigo do indice e nao temos mais alternativas :( Interrompemos a funcao
-                raise KeyError("Nao foi possivel identificar o indice {}".format(nome_indice))
+        # Nao conseguimos encontrar o codigo do indice e nao temos mais alternativas :( Interrompemos a funcao
+        raise KeyError("Nao foi possivel identificar o indice {}".format(nome_indice))
     return codigo_indice
 
 
+_locais_clientes = threading.local()
+
+
+def _cliente_bcb():
+
+    # Clientes SUDS nao sao seguros entre threads, entao cada thread tem o seu, com o WSDL em cache no disco
+    if getattr(_locais_clientes, 'cliente', None) is None:
+        _locais_clientes.cliente = Client(constantes.wsdl_bcb, cache=ObjectCache(constantes.diretorio_cache_wsdl,
+                                                                                 days=constantes.dias_cache_wsdl))
+    return _locais_clientes.cliente
+
+
+def _recupera_lote(lista_codigos, data_inicio, data_fim):
+
+    # Recuperamos todas as series do lote em uma unica requisicao
+    try:
+        string_xml = _cliente_bcb().service.getValoresSeriesXML([int(codigo) for codigo in lista_codigos],
+                                                                data_inicio.strftime('%d/%m/%Y'),
+                                                                data_fim.strftime('%d/%m/%Y'))
+        return normaliza_xml_series(string_xml, lista_codigos)
+
+    # No caso de nao termos recuperado nenhum dado, a falha pode vir de apenas uma das series do lote.
+    # Repetimos entao a requisicao serie a serie, ignorando apenas as que de fato nao tem dados
+    except WebFault as wbf_i:
+        if 'Value(s) not found' not in str(wbf_i):
+            raise wbf_i
+        if len(lista_codigos) == 1:
+            return {}
+        resultado = {}
+        for codigo in lista_codigos:
+            resultado.update(_recupera_lote([codigo], data_inicio, data_fim))
+        return resultado
+
+
+def divide_intervalo(data_inicio, data_fim, dias_por_bloco):
+
+    # Dividimos o intervalo [inicio, fim] em blocos consecutivos de no maximo dias_por_bloco dias
+    if dias_por_bloco is None:
+        return [(data_inicio, data_fim)]
+    blocos = []
+    inicio = data_inicio
+    while inicio <= data_fim:
+        fim = min(inicio + datetime.timedelta(days=dias_por_bloco - 1), data_fim)
+        blocos.append((inicio, fim))
+        inicio = fim + datetime.timedelta(days=1)
+    return blocos
+
+
+def _recupera_bloco(lista_codigos, data_inicio, data_fim, tentativas=3, espera_inicial=1.0):
+
+    # Recuperamos um bloco, repetindo a requisicao (com espera crescente) em caso de falhas de conexao
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return _recupera_lote(lista_codigos, data_inicio, data_fim)
+        except (TransportError, OSError) as exp:
+            if tentativa >= tentativas:
+                raise exp
+            espera = espera_inicial * (2 ** (tentativa - 1))
+            logging.getLogger('py_financas:bcb_sgs').warning(
+                "Falha na recuperacao das series {} de {} a {} ({}). Nova tentativa em {}s".format(
+                    lista_codigos, data_inicio, data_fim, exp, espera))
+            time.sleep(espera)
+
+
 """
 # PAYLOAD
 """
 
 
-def recupera_indice(nome_indice, data_inicio, data_fim=_utils.ultimo_dia_util()):
+def recupera_indice(nome_indice, data_inicio, data_fim=None, tamanho_lote=10, max_workers=1,
+                    armazem=None, offline=False, dias_por_bloco=3650, tentativas=3):
+
+    # Por padrao, buscamos ate o ultimo dia util (na data da chamada), do mesmo tipo da data de inicio
+    if data_fim is None:
+        data_fim = _utils.ultimo_dia_util()
+        if isinstance(data_fim, datetime.datetime) and not isinstance(data_inicio, datetime.datetime):
+            data_fim = data_fim.date()
 
     # Validamos a entrada
     assert data_inicio <= data_fim, "Data {} nao e anterior a data {}".format(data_inicio, data_fim)
+    assert tamanho_lote > 0, "Tamanho de lote {} invalido".format(tamanho_lote)
+    assert (dias_por_bloco is None) or (dias_por_bloco > 0), "Tamanho de bloco {} invalido".format(dias_por_bloco)
+    assert (armazem is not None) or (not offline), "A leitura offline requer um armazem local de series"
 
     # Normalizamos o nome do indice recebido como uma lista
     if not isinstance(nome_indice, list):
         nome_indice = [nome_indice]
 
+    # O armazem local pode ser informado pelo caminho do seu arquivo
+    if isinstance(armazem, str):
+        armazem = ArmazemSeriesSGS(armazem)
+
     # Traduzimos os codigos dos bcb_sgs buscados
     lista_codigos_indices = [normaliza_codigo_indice(indice) for indice in nome_indice]
+    codigos_unicos = list(dict.fromkeys(lista_codigos_indices))
+
+    # Agrupamos os codigos (sem repeticao) pelo intervalo de datas a recuperar. Sem armazem local, e o intervalo
+    # inteiro. Com armazem, apenas os trechos ainda nao armazenados (normalmente, os dias mais recentes)
+    intervalos_por_codigo = {}
+    for codigo in codigos_unicos:
+        if armazem is None:
+            faltantes = [(data_inicio, data_fim)]
+        elif offline:
+            faltantes = []
+        else:
+            faltantes = armazem.faltantes(codigo, data_inicio, data_fim)
+        for intervalo in faltantes:
+            intervalos_por_codigo.setdefault(intervalo, []).append(codigo)
+
+    # Dividimos os intervalos longos em blocos de datas, e os codigos de cada intervalo em lotes.
+    # Cada lote de cada bloco e recuperado em uma unica requisicao, em ordem de data
+    requisicoes = [(codigos[i:i + tamanho_lote], inicio_bloco, fim_bloco)
+                   for (inicio, fim), codigos in sorted(intervalos_por_codigo.items())
+                   for inicio_bloco, fim_bloco in divide_intervalo(inicio, fim, dias_por_bloco)
+                   for i in range(0, len(codigos), tamanho_lote)]
+    logging.getLogger('py_financas:bcb_sgs').debug("Recuperacao dividida em {} requisicoes: {}".format(
+        len(requisicoes), [(lote, str(inicio), str(fim)) for lote, inicio, fim in requisicoes]))
+
+    # Recuperamos as requisicoes, em paralelo se houver mais de uma thread
+    def recupera(requisicao): return _recupera_bloco(*requisicao, tentativas=tentativas)
+    if (max_workers > 1) and (len(requisicoes) > 1):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            resultados = list(executor.map(recupera, requisicoes))
+    else:
+        resultados = [recupera(requisicao) for requisicao in requisicoes]
+
+    # Sem armazem, concatenamos os valores de cada codigo, bloco a bloco. Com armazem, gravamos os valores
+    # recuperados e lemos o intervalo completo
+    if armazem is None:
+        valores_por_codigo = {}
+        for valores_lote in resultados:
+            for codigo, valores in valores_lote.items():
+                valores_por_codigo.setdefault(codigo, []).extend(valores)
+    else:
 
-    # Inicializamos um cliente SUDS WSDL apontado para o arquivo WSDL da plataforma BCB SGS
-    server = Client(constantes.wsdl_bcb)
+        # Cada intervalo faltante e gravado de uma vez (com os valores de todos os seus blocos), de modo que apenas
+        # o seu fim seja tratado como recente pelo armazem, e nao o fim de cada bloco
+        for (inicio, fim), codigos in intervalos_por_codigo.items():
+            for codigo in codigos:
+                valores = []
+                for (lote, inicio_bloco, fim_bloco), valores_lote in zip(requisicoes, resultados):
+                    if (codigo in lote) and (inicio <= inicio_bloco) and (fim_bloco <= fim):
+                        valores.extend(valores_lote.get(codigo, []))
+                armazem.grava(codigo, inicio, fim, valores)
+        valores_por_codigo = {codigo: armazem.le(codigo, data_inicio, data_fim) for codigo in codigos_unicos}
 
     # Inicializamos um buffer para os resultados
     buffer_series = []
 
-    # Para cada codigo de indice a ser recuperado
+    # Para cada codigo de indice a ser recuperado, formatamos sua lista de valores como uma Serie Pandas
     for codigo_indice, nome_recebido_indice in zip(lista_codigos_indices, nome_indice):
-        try:
-            string_xml = server.service.getValoresSeriesXML([int(codigo_indice)],
-                                                            data_inicio.strftime('%d/%m/%Y'),
-                                                            data_fim.strftime('%d/%m/%Y'))
-
-            # Formatamos o resultado do codigo atual
-            valores = normaliza_xml(string_xml)
-
-            # Formatamos a lista de valores recuperada como uma Serie Pandas
-            serie = pd.Series(pd.to_numeric([v['VALOR'] for v in valores]),
-                              index=pd.to_datetime([v['DATA'] for v in valores], dayfirst=True),
-                              name=nome_recebido_indice)
-            buffer_series.append(serie)
 
         # No caso de nao termos recuperado nenhum dado para o indice atual, o ignoramos
-        except WebFault as wbf_i:
-            if 'Value(s) not found' in str(wbf_i):
-                pass
-            else:
-                raise wbf_i
-
-    # Apos o loop, unificamos as series como um dataframe que retornamos
-    return pd.DataFrame(buffer_series).T
+        valores = valores_por_codigo.get(codigo_indice)
+        if not valores:
+            continue
+
+        serie = pd.Series(pd.to_numeric([v['VALOR'] for v in valores]),
+                          index=pd.to_datetime([v['DATA'] for v in valores], dayfirst=True),
+                          name=nome_recebido_indice)
+        buffer_series.append(serie)
+
+    # Apos o loop, unificamos as series como um dataframe, e registramos como a recuperacao foi dividida
+    resultado = pd.DataFrame(buffer_series).T
+    resultado.attrs['requisicoes'] = requisicoes
+    return resultado
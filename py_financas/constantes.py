@@ -27,9 +27,24 @@
 wsdl_cvm = 'http://sistemas.cvm.gov.br/webservices/Sistemas/SCW/CDocs/WsDownloadInfs.asmx?WSDL'
 wsdl_bcb = 'https://www3.bcb.gov.br/sgspub/JSP/sgsgeral/FachadaWSSGS.wsdl'
 
+# Cache em disco das definicoes WSDL ja lidas (diretorio None usa o diretorio temporario do SUDS), em dias
+diretorio_cache_wsdl = None
+dias_cache_wsdl = 7
+
 # Codigos do sistema CVM
 codigo_informes_diarios_fundos = '209'
 
 # Codigos do sistema BCB (lemos a tabela de forma transposta)
 proximidade_nome_indice = 0.95
 df_tabela_codigos_bcb = None
+indice_nomes_bcb = None
+
+# Calendario de dias uteis (feriados nacionais e da B3), montado no primeiro uso para os anos do intervalo.
+# O intervalo e ampliado automaticamente quando uma data fora dele e consultada
+primeiro_ano_calendario = 1990
+ultimo_ano_calendario = 2100
+calendario_dias_uteis = None
+
+# Relogio usado nas datas padrao (hoje, ultimo dia util) das operacoes: uma funcao sem argumentos que retorna um
+# datetime, como datetime.datetime.now (se None). Permite fixar a data, em testes ou reprocessamentos
+relogio = None
@@ -25,3 +25,4 @@
 
 from .recupera_cadastros_fundos import recupera_cadastros
 from .recupera_informes_diarios_de_hoje import recupera_informes_diarios_de_hoje
+from .recupera_informes_diarios_historicos import recupera_informes_diarios, FalhaInformesDiarios
@@ -25,10 +25,9 @@
 
 # Biblioteca padrao
 import logging
+from xml.etree import ElementTree
 
 # Dependencias PIP
-import requests
-import xmltodict
 import numpy as np
 import pandas as pd
 
@@ -36,67 +35,122 @@ import pandas as pd
 from py_financas import _utils
 
 
+"""
+# UTILS
+"""
+
+
+def _elemento_para_valor(elemento):
+
+    # Mesma representacao do xmltodict: o texto (sem espacos nas bordas, ou None) de elementos simples,
+    # e um dicionario de atributos (@), filhos (listas, se repetidos) e texto (#text) dos demais
+    texto = elemento.text.strip() if elemento.text is not None else ''
+    if (len(elemento) == 0) and (len(elemento.attrib) == 0):
+        return texto if texto != '' else None
+
+    valor = {'@' + chave: atributo for chave, atributo in elemento.attrib.items()}
+    for filho in elemento:
+        valor_filho = _elemento_para_valor(filho)
+        if filho.tag not in valor:
+            valor[filho.tag] = valor_filho
+        elif isinstance(valor[filho.tag], list):
+            valor[filho.tag].append(valor_filho)
+        else:
+            valor[filho.tag] = [valor[filho.tag], valor_filho]
+    if texto != '':
+        valor['#text'] = texto
+    return valor
+
+
+def le_cadastros_xml(arquivo_xml):
+
+    # Lemos o XML como um fluxo de eventos, e acumulamos os campos de cada CADASTRO diretamente em colunas.
+    # Cada CADASTRO e descartado da arvore assim que lido, de modo que a memoria fica limitada as colunas
+    colunas = {}
+    quantidade_cadastros = 0
+    pilha = []
+    for evento, elemento in ElementTree.iterparse(arquivo_xml, events=('start', 'end')):
+        if evento == 'start':
+            pilha.append(elemento)
+            continue
+        pilha.pop()
+        if (elemento.tag != 'CADASTRO') or (len(pilha) == 0) or (pilha[-1].tag != 'PARTICIPANTES'):
+            continue
+
+        # Inserimos os campos do cadastro nas colunas, completando com NaN os campos ausentes
+        cadastro = _elemento_para_valor(elemento)
+        if not isinstance(cadastro, dict): cadastro = {}
+        for campo, valor in cadastro.items():
+            if campo not in colunas:
+                colunas[campo] = [np.nan] * quantidade_cadastros
+            colunas[campo].append(valor)
+        quantidade_cadastros += 1
+        for coluna in colunas.values():
+            if len(coluna) < quantidade_cadastros:
+                coluna.append(np.nan)
+
+        # Descartamos o cadastro ja lido
+        pilha[-1].remove(elemento)
+
+    return pd.DataFrame(colunas)
+
+
 """
 # PAYLOAD
 """
 
 
 def recupera_cadastros(usuario_cvm, senha_cvm,
-                       data_busca=_utils.unidades_brasileiras.ultimo_dia_util(),
+                       data_busca=None,
                        justificativa='Obtencao de cadastros de cvm'):
 
     # Inicializamos o objeto de log
     log = logging.getLogger('py_financas:cvm')
 
-    # Inicializamos um cliente com a CVM
-    cliente_wsdl_cvm = _utils.inicializa_cliente_wsdl_cvm(usuario_cvm, senha_cvm)
+    # Por padrao, buscamos os cadastros do ultimo dia util (na data da chamada)
+    if data_busca is None:
+        data_busca = _utils.ultimo_dia_util()
+
+    # Obtemos a sessao (compartilhada e autenticada) com a CVM
+    sessao_cvm = _utils.obtem_sessao_cvm(usuario_cvm, senha_cvm)
 
     # Solicitamos uma URL para download do documento de cadastros dos cvm
-    url_documento = cliente_wsdl_cvm.service.solicAutorizDownloadCadastro(data_busca.strftime("%Y-%m-%d"), justificativa)
+    url_documento = sessao_cvm.chama('solicAutorizDownloadCadastro', data_busca.strftime("%Y-%m-%d"), justificativa)
 
     log.debug("Obtida a URL de download de cadastros de cvm ({}) para o dia {}".format(url_documento, data_busca))
 
-    # Recuperamos o documento da URL
-    documento_fundos_raw = requests.get(url_documento).content
-
-    log.debug("Recuperado o documento de cadastros de cvm de {}".format(data_busca))
-
-    # Extraimos o conteudo do documento (Zipado) para uma string XML
-    documento_fundos = _utils.le_arquivo_zip_de_string(documento_fundos_raw)
+    # Recuperamos o documento da URL, em um arquivo temporario (em memoria, ou no disco se for grande)
+    with _utils.baixa_arquivo(url_documento) as documento_fundos_raw:
 
-    # Convertemos o documento XML para um dicionario Python
-    dict_fundos = xmltodict.parse(documento_fundos)
+        log.debug("Recuperado o documento de cadastros de cvm de {}".format(data_busca))
 
-    # Convertemos o dicionario para um objeto PANDAS
-    cadastros_fundos = pd.DataFrame().from_dict(dict_fundos['ROOT']['PARTICIPANTES']['CADASTRO'])
+        # Lemos os cadastros de cada documento XML do ZIP diretamente para um objeto PANDAS, descompactando-os
+        cadastros_fundos = pd.concat([
+            le_cadastros_xml(documento_fundos)
+            for _, documento_fundos in _utils.itera_arquivos_zip_de_string(documento_fundos_raw)
+        ], ignore_index=True)
 
     log.debug("Obtidos os cadastros de {} cvm".format(len(cadastros_fundos.index)))
 
-    # Normalizamos os valores booleanos dos cadastros
-    cadastros_fundos = cadastros_fundos.replace(u'Sim', True)
-    cadastros_fundos = cadastros_fundos.replace(u'Não', False)
-
-    # Inicializamos buffers para a taxa de performance e seus detalhes
-    lista_taxa_performance = []
-    lista_detalhes_taxa_performance = []
-
-    # Para cada elemento da coluna da taxa de performance
-    for tp in cadastros_fundos['TAXA_PERFORMANCE'].fillna('0.0'):
-
-        # Dividimos o elemento e capturamos sua primeira parte (numerica)
+    # Normalizamos os valores booleanos dos cadastros, apenas nas colunas em que aparecem.
+    # As comparacoes sao feitas sobre os valores (arrays NumPy) de cada coluna, sem percorrer o dataframe inteiro
+    for coluna in cadastros_fundos.columns:
+        valores = np.asarray(cadastros_fundos[coluna], dtype=object)
+        sim, nao = (valores == u'Sim'), (valores == u'Não')
+        if sim.any() or nao.any():
+            valores = valores.copy()
+            valores[sim] = True
+            valores[nao] = False
+            cadastros_fundos[coluna] = valores
+
+    # Dividimos a taxa de performance no primeiro espaco, entre sua parte numerica e sua parte textual (se houver).
+    # A taxa tem poucos valores distintos, entao cada um deles e dividido uma unica vez
+    taxa_performance = cadastros_fundos['TAXA_PERFORMANCE'].fillna('0.0')
+    tp_numerica, tp_detalhe = {}, {}
+    for tp in taxa_performance.unique():
         divisao = tp.split(' ', 1)
-        tp_numerica = divisao[0]
-
-        # Se houver, capturamos a segunda parte (textual)
-        if len(divisao) > 1:
-            detalhe = divisao[1]
-        else:
-            # Se nao houver, a parte textual e um np.NaN
-            detalhe = np.NaN
-
-        # Inserimos as duas partes normalizadas nos buffers
-        lista_taxa_performance.append(float(tp_numerica.replace(',', '.')))
-        lista_detalhes_taxa_performance.append(detalhe)
+        tp_numerica[tp] = float(divisao[0].replace(',', '.'))
+        tp_detalhe[tp] = divisao[1] if len(divisao) > 1 else np.nan
 
     # Aplicamos normalizações no dataframe por coluna
     cadastros_fundos = cadastros_fundos.assign(
@@ -107,14 +161,14 @@ def recupera_cadastros(usuario_cvm, senha_cvm,
         DT_INICIO_CLASSE = pd.to_datetime(cadastros_fundos['DT_INICIO_CLASSE']),
 
         # Normalizamos os campos CNPJ como strings de 14 digitos numericos, inserindo zeros a esquerda
-        CNPJ = cadastros_fundos['CNPJ'].apply(_utils.normaliza_cnpj),
-        CNPJ_ADMINISTRADOR = cadastros_fundos['CNPJ_ADMINISTRADOR'].apply(_utils.normaliza_cnpj),
+        CNPJ = _utils.normaliza_cnpj_serie(cadastros_fundos['CNPJ']),
+        CNPJ_ADMINISTRADOR = _utils.normaliza_cnpj_serie(cadastros_fundos['CNPJ_ADMINISTRADOR']),
 
         # Normalizamos a taxa de performance como valores numericos, inserindo taxa 0 nos valores numericos
-        TAXA_PERFORMANCE = lista_taxa_performance,
+        TAXA_PERFORMANCE = taxa_performance.map(tp_numerica),
 
-        # Normalizamos o texto detahado da taxa de performance, inserindo strings vazias nas posicoes faltantes
-        DETALHE_TAXA_PERFORMANCE = lista_detalhes_taxa_performance
+        # Normalizamos o texto detahado da taxa de performance, inserindo NaN nas posicoes faltantes
+        DETALHE_TAXA_PERFORMANCE = taxa_performance.map(tp_detalhe)
     )
 
     # Retornamos o dataframe, com sorte sem problemas de normalização
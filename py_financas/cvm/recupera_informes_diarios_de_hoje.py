@@ -29,7 +29,6 @@ import logging
 
 # Dependencias PIP
 import xmltodict
-import requests
 import pandas as pd
 
 # Este pacote
@@ -37,59 +36,37 @@ from py_financas import _utils, constantes
 
 
 """
-# PAYLOAD
+# UTILS
 """
 
 
-def recupera_informes_diarios_de_hoje(usuario_cvm, senha_cvm,
-                                      justificativa='Obtencao de informes diarios de cvm'):
-
-    # Inicializamos o objeto de log
-    log = logging.getLogger('py_financas:cvm')
+def le_informes_diarios(documento_fundos_raw):
 
-    # Testamos se o dia de hoje e um dia util
-    if not _utils.unidades_brasileiras.e_dia_util():
+    # Percorremos todos os documentos XML do ZIP, descompactando-os aos poucos
+    valor = []
+    for _, documento_fundos in _utils.itera_arquivos_zip_de_string(documento_fundos_raw):
 
-        # Se nao, interrompemos a funcao imediatamente
-        log.debug("Hoje nao e um dia util. Nao e possivel recuperar os informes diarios de cvm de hoje do sistema CVM")
-        return pd.DataFrame()
+        # Convertemos o documento XML para um dicionario Python
+        dict_fundos = xmltodict.parse(documento_fundos)
 
-    # Inicializamos um cliente com a CVM
-    cliente_wsdl_cvm = _utils.inicializa_cliente_wsdl_cvm(usuario_cvm, senha_cvm)
+        # Obtemos o valor dos informes. Se um campo interno for nulo, o documento nao tem informes
+        informes = dict_fundos['ROOT']
+        if informes is not None:
+            informes = informes['INFORMES']
+        if informes is not None:
+            informes = informes['INFORME_DIARIO']
+        if informes is None:
+            continue
 
-    # Solicitamos uma URL para download do documento de informes diarios dos cvm
-    url_documento = cliente_wsdl_cvm.service.solicAutorizDownloadArqEntrega(constantes.codigo_informes_diarios_fundos,
-                                                                            justificativa)
+        # Normalizamos o tamanho minimo da lista
+        if not isinstance(informes, list):
+            informes = [informes]
+        valor.extend(informes)
 
-    log.debug("Obtida a URL para download dos informes diarios de cvm: {}".format(url_documento))
-
-    # Recuperamos o documento da URL
-    documento_fundos_raw = requests.get(url_documento).content
-
-    log.debug("Recuperado o documento de informes diarios de cvm do ultimo dia util")
-
-    # Extraimos o conteudo do documento (Zipado) para uma string XML
-    documento_fundos = _utils.le_arquivo_zip_de_string(documento_fundos_raw)
-
-    # Convertemos o documento XML para um dicionario Python
-    dict_fundos = xmltodict.parse(documento_fundos)
-
-    # Obtemos o valor dos informes. Se um campo interno for nulo, retornamos um dataframe vazio
-    valor = dict_fundos['ROOT']
-    if valor is not None:
-        valor = valor['INFORMES']
-        if valor is not None:
-            valor = valor['INFORME_DIARIO']
-        else:
-            return pd.DataFrame()
-    else:
+    # Se nenhum documento tem informes, retornamos um dataframe vazio
+    if len(valor) == 0:
         return pd.DataFrame()
 
-    # Se chegamos ate aqui, devemos continuar.
-    # Normalizamos o tamanho minimo da lista
-    if not isinstance(valor, list):
-        valor = [valor]
-
     # Convertemos o dicionario para um objeto PANDAS
     dataframe_informes_fundos = pd.DataFrame().from_dict(valor)
 
@@ -97,19 +74,55 @@ def recupera_informes_diarios_de_hoje(usuario_cvm, senha_cvm,
     dataframe_informes_fundos = dataframe_informes_fundos.assign(
 
         # Normalizamos as colunas numericas
-        CAPTC_DIA = pd.to_numeric(dataframe_informes_fundos['CAPTC_DIA'].apply(_utils.normaliza_numerico)),
-        NR_COTST = pd.to_numeric(dataframe_informes_fundos['NR_COTST'].apply(_utils.normaliza_numerico)),
-        PATRIM_LIQ = pd.to_numeric(dataframe_informes_fundos['PATRIM_LIQ'].apply(_utils.normaliza_numerico)),
-        RESG_DIA = pd.to_numeric(dataframe_informes_fundos['RESG_DIA'].apply(_utils.normaliza_numerico)),
-        VL_QUOTA = pd.to_numeric(dataframe_informes_fundos['VL_QUOTA'].apply(_utils.normaliza_numerico)),
-        VL_TOTAL = pd.to_numeric(dataframe_informes_fundos['VL_TOTAL'].apply(_utils.normaliza_numerico)),
+        CAPTC_DIA = _utils.normaliza_numerico_serie(dataframe_informes_fundos['CAPTC_DIA']),
+        NR_COTST = _utils.normaliza_numerico_serie(dataframe_informes_fundos['NR_COTST']),
+        PATRIM_LIQ = _utils.normaliza_numerico_serie(dataframe_informes_fundos['PATRIM_LIQ']),
+        RESG_DIA = _utils.normaliza_numerico_serie(dataframe_informes_fundos['RESG_DIA']),
+        VL_QUOTA = _utils.normaliza_numerico_serie(dataframe_informes_fundos['VL_QUOTA']),
+        VL_TOTAL = _utils.normaliza_numerico_serie(dataframe_informes_fundos['VL_TOTAL']),
 
         # Normalizamos as colunas de datas
         DT_COMPTC = pd.to_datetime(dataframe_informes_fundos['DT_COMPTC']),
 
         # Normalizamos a coluna de CNPJ
-        CNPJ_FDO = dataframe_informes_fundos['CNPJ_FDO'].append(_utils.normaliza_cnpj)
+        CNPJ_FDO = _utils.normaliza_cnpj_serie(dataframe_informes_fundos['CNPJ_FDO'])
     )
 
     # Retornamos o dataframe normalizado
     return dataframe_informes_fundos
+
+
+"""
+# PAYLOAD
+"""
+
+
+def recupera_informes_diarios_de_hoje(usuario_cvm, senha_cvm,
+                                      justificativa='Obtencao de informes diarios de cvm'):
+
+    # Inicializamos o objeto de log
+    log = logging.getLogger('py_financas:cvm')
+
+    # Testamos se o dia de hoje e um dia util
+    if not _utils.unidades_brasileiras.e_dia_util():
+
+        # Se nao, interrompemos a funcao imediatamente
+        log.debug("Hoje nao e um dia util. Nao e possivel recuperar os informes diarios de cvm de hoje do sistema CVM")
+        return pd.DataFrame()
+
+    # Obtemos a sessao (compartilhada e autenticada) com a CVM
+    sessao_cvm = _utils.obtem_sessao_cvm(usuario_cvm, senha_cvm)
+
+    # Solicitamos uma URL para download do documento de informes diarios dos cvm
+    url_documento = sessao_cvm.chama('solicAutorizDownloadArqEntrega', constantes.codigo_informes_diarios_fundos,
+                                     justificativa)
+
+    log.debug("Obtida a URL para download dos informes diarios de cvm: {}".format(url_documento))
+
+    # Recuperamos o documento da URL, em um arquivo temporario (em memoria, ou no disco se for grande)
+    with _utils.baixa_arquivo(url_documento) as documento_fundos_raw:
+
+        log.debug("Recuperado o documento de informes diarios de cvm do ultimo dia util")
+
+        # Lemos e normalizamos os informes do documento
+        return le_informes_diarios(documento_fundos_raw)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+#
+# Copyright 2017 jfrfonseca
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Operacoes de recuperacao do historico de dados diarios de fundos, em um intervalo de datas"""
+
+
+"""
+# IMPORTS
+"""
+
+
+# Biblioteca padrao
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Dependencias PIP
+import pandas as pd
+
+# Este pacote
+from py_financas import _utils, constantes
+from .recupera_informes_diarios_de_hoje import le_informes_diarios
+
+
+"""
+# UTILS
+"""
+
+
+def dias_uteis(data_inicio, data_fim):
+
+    # Listamos os dias uteis do intervalo (como datas), incluindo as datas de inicio e fim
+    return _utils.dias_uteis(data_inicio, data_fim).tolist()
+
+
+class FalhaInformesDiarios(Exception):
+    """
+    Falha na recuperacao de alguns dos dias do intervalo, levantada apos a recuperacao de todos os demais.
+    Mantem os dias com falha (e suas excecoes), e o resultado parcial: os arquivos gravados, ou o dataframe dos
+    informes dos dias recuperados
+    """
+
+    def __init__(self, falhas, resultado):
+        self.falhas = falhas
+        self.dias_com_falha = sorted(falhas)
+        self.resultado = resultado
+        super().__init__("Falha na recuperacao dos informes diarios de cvm de {} dia(s): {}".format(
+            len(falhas), ', '.join(str(data) for data in self.dias_com_falha)))
+
+
+"""
+# PAYLOAD
+"""
+
+
+def recupera_informes_diarios(usuario_cvm, senha_cvm, data_inicio, data_fim,
+                              justificativa='Obtencao de informes diarios de cvm',
+                              max_workers=8, diretorio_saida=None):
+
+    # Inicializamos o objeto de log
+    log = logging.getLogger('py_financas:cvm')
+
+    # Listamos os dias uteis do intervalo. Se nao houver nenhum, interrompemos a funcao imediatamente
+    dias = dias_uteis(data_inicio, data_fim)
+    if len(dias) == 0:
+        log.debug("Nao ha dias uteis entre {} e {}".format(data_inicio, data_fim))
+        return [] if diretorio_saida is not None else pd.DataFrame()
+
+    # Obtemos a sessao (compartilhada e autenticada) com a CVM, que fornece a cada thread seu proprio cliente.
+    # O login e feito aqui, antes de iniciar as threads
+    sessao_cvm = _utils.obtem_sessao_cvm(usuario_cvm, senha_cvm)
+    sessao_cvm.cliente()
+
+    # O diretorio de saida e criado, se ainda nao existir
+    if diretorio_saida is not None:
+        os.makedirs(diretorio_saida, exist_ok=True)
+
+    def recupera_dia(data):
+
+        # Solicitamos uma URL para download do documento de informes diarios entregues na data
+        url_documento = sessao_cvm.chama('solicAutorizDownloadArqEntregaPorData',
+                                         constantes.codigo_informes_diarios_fundos, data.strftime("%Y-%m-%d"),
+                                         justificativa)
+
+        log.debug("Obtida a URL para download dos informes diarios de cvm de {}: {}".format(data, url_documento))
+
+        # Recuperamos o documento da URL (com as conexoes compartilhadas entre as threads), e o lemos ja normalizado
+        with _utils.baixa_arquivo(url_documento) as documento_fundos_raw:
+            return le_informes_diarios(documento_fundos_raw)
+
+    # Recuperamos os dias em paralelo, com um numero limitado de threads. Cada dia e consumido assim que termina:
+    # gravado em seu proprio arquivo (se houver um diretorio de saida), ou acumulado para a concatenacao final.
+    # Cada futuro e descartado assim que consumido, liberando o dataframe do dia ja gravado
+    resultados, falhas = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {executor.submit(recupera_dia, data): data for data in dias}
+        for futuro in as_completed(futuros):
+            data = futuros.pop(futuro)
+            try:
+                informes = futuro.result()
+            except Exception as exp:
+                log.error("Excecao na recuperacao dos informes diarios de cvm de {}! {}".format(data, exp))
+                falhas[data] = exp
+                continue
+            finally:
+                del futuro
+
+            log.debug("Recuperados {} informes diarios de cvm de {}".format(len(informes.index), data))
+
+            if diretorio_saida is not None:
+                arquivo = os.path.join(diretorio_saida, 'informes_diarios_{}.csv'.format(data.strftime("%Y-%m-%d")))
+                informes.to_csv(arquivo, index=False)
+                resultados[data] = arquivo
+            else:
+                resultados[data] = informes
+            del informes
+
+    # Reunimos os arquivos gravados, ou os informes de todos os dias em um unico dataframe, em ordem de data
+    if diretorio_saida is not None:
+        resultado = [resultados[data] for data in sorted(resultados)]
+    elif len(resultados) == 0:
+        resultado = pd.DataFrame()
+    else:
+        resultado = pd.concat([resultados[data] for data in sorted(resultados)], ignore_index=True)
+
+    # Se algum dia falhou, levantamos a falha (com o resultado parcial) apos recuperar todos os demais
+    if len(falhas) > 0:
+        raise FalhaInformesDiarios(falhas, resultado)
+    return resultado
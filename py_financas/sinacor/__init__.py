@@ -1,3 +1,14 @@
 
-from py_financas.sinacor.parser import parse_notas_corretagem
-from py_financas.sinacor.positions import parse_posicoes, parse_posicoes_de_notas_de_corretagem
+# This package. The modules (and pdfplumber, pandas) are only imported on first access
+from py_financas._importacao_tardia import exporta_tardiamente
+__getattr__, __dir__ = exporta_tardiamente(__name__, globals(), {
+    'parse_notas_corretagem': ('py_financas.sinacor.parser', 'parse_notas_corretagem'),
+    'iter_notas_corretagem': ('py_financas.sinacor.parser', 'iter_notas_corretagem'),
+    'parse_posicoes': ('py_financas.sinacor.positions', 'parse_posicoes'),
+    'parse_posicoes_de_notas_de_corretagem': ('py_financas.sinacor.positions', 'parse_posicoes_de_notas_de_corretagem'),
+    'EstadoPosicoes': ('py_financas.sinacor.positions', 'EstadoPosicoes'),
+    'PageCache': ('py_financas.sinacor.cache', 'PageCache'),
+    'parse_posicoes_vetorizadas': ('py_financas.sinacor.vectorized', 'parse_posicoes_vetorizadas'),
+    'posicoes_para_dataframe': ('py_financas.sinacor.vectorized', 'posicoes_para_dataframe'),
+    'Instrumentation': ('py_financas.sinacor.instrumentation', 'Instrumentation'),
+})
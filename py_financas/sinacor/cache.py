@@ -0,0 +1,117 @@
+
+
+# STDLib
+import os
+import gzip
+import json
+import hashlib
+import tempfile
+from typing import List, Union
+
+# PIP
+import pdfplumber
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'py_financas', 'sinacor')
+DEFAULT_CACHE_MAX_SIZE = 512 * 1024 * 1024  # Bytes
+HASH_BLOCK_SIZE = 1024 * 1024  # Bytes
+CACHE_EXTENSION = '.json.gz'
+
+
+# UTILS
+#######################################################################################################################
+
+
+def file_hash(filename:str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as fin:
+        for block in iter(lambda: fin.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# CACHE
+#######################################################################################################################
+
+
+# Entries are keyed by the hash of the file contents and by the pdfplumber version, so changed files (or files
+# extracted by another version of pdfplumber) never reuse stale text. The least recently used entries are evicted
+# whenever the total size of the cache exceeds max_size
+class PageCache():
+
+    def __init__(self, directory:str=DEFAULT_CACHE_DIRECTORY, max_size:int=DEFAULT_CACHE_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __repr__(self) -> str: return f'<PageCache {self.directory} [{len(self.entries())}] {self.size()}B>'
+    def __str__(self) -> str: return self.__repr__()
+
+    def key(self, filename:str) -> str:
+        return f'{file_hash(filename)}-{pdfplumber.__version__}'
+
+    def _path(self, key:str) -> str:
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def entries(self) -> List[str]:
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith(CACHE_EXTENSION)]
+
+    def size(self) -> int:
+        return sum(os.path.getsize(f) for f in self.entries())
+
+    def get(self, key:str) -> Union[List[str], None]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as fin:
+                pages = json.load(fin)
+        except (FileNotFoundError, EOFError, OSError, ValueError):
+            return None
+
+        # Mark the entry as recently used, for the eviction policy (unless another process evicted it meanwhile)
+        try: os.utime(path)
+        except FileNotFoundError: pass
+        return pages
+
+    def put(self, key:str, pages:List[str]):
+
+        # Write to a temporary file and then move it, so concurrent readers never see a partial entry.
+        # The temporary file is removed if the write (or the move) fails
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False) as fout:
+            temporary = fout.name
+        try:
+            with gzip.open(temporary, 'wt', encoding='utf-8') as gzout:
+                json.dump(pages, gzout)
+            os.replace(temporary, self._path(key))
+        finally:
+            if os.path.exists(temporary): os.remove(temporary)
+        self.evict()
+
+    def evict(self):
+
+        # Entries removed by another process (between the listing and the stat, or the removal) are skipped
+        entries = []
+        for path in self.entries():
+            try: stat = os.stat(path)
+            except FileNotFoundError: continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size: break
+            total -= size
+            try: os.remove(path)
+            except FileNotFoundError: pass
+
+    def invalidate(self, filename:str):
+        prefix = file_hash(filename) + '-'
+        for path in self.entries():
+            if os.path.basename(path).startswith(prefix):
+                os.remove(path)
+
+    def clear(self):
+        for path in self.entries():
+            os.remove(path)
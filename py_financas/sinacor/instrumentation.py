@@ -0,0 +1,100 @@
+
+
+# STDLib
+import time
+from functools import wraps
+from contextvars import ContextVar
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Callable, Union, Iterator, Any
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+# The collector active in the current context (thread or task). None disables the instrumentation
+_active: ContextVar = ContextVar('py_financas_sinacor_instrumentation', default=None)
+_NULL_STAGE = nullcontext()
+
+
+# COLLECTOR
+#######################################################################################################################
+
+
+# Collects the wall time of each stage (total and number of calls) and counters of pages, regex matches and objects.
+# Active inside its "with" block. The callback, if any, receives every measurement as it is recorded,
+# as (kind, name, value), where kind is 'time' (seconds) or 'count'
+class Instrumentation():
+
+    def __init__(self, callback:Union[Callable[[str,str,float],Any],None]=None):
+        self.callback = callback
+        self.times: Dict[str,float] = {}
+        self.calls: Dict[str,int] = {}
+        self.counters: Dict[str,int] = {}
+        self._token = None
+
+    def __repr__(self) -> str: return f'<Instrumentation [{len(self.times)}|{len(self.counters)}]>'
+    def __str__(self) -> str: return self.__repr__()
+
+    def __enter__(self) -> 'Instrumentation':
+        self._token = _active.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active.reset(self._token)
+        self._token = None
+
+    @contextmanager
+    def stage(self, name:str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.times[name] = self.times.get(name, 0.0) + elapsed
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.callback is not None: self.callback('time', name, elapsed)
+
+    def count(self, name:str, value:int=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+        if self.callback is not None: self.callback('count', name, value)
+
+    def as_dict(self) -> Dict[str,Dict]:
+        return {
+            'stages': {name: {'seconds': self.times[name], 'calls': self.calls[name]} for name in self.times},
+            'counters': dict(self.counters),
+        }
+
+
+# HOOKS
+#######################################################################################################################
+
+
+def enabled() -> bool: return _active.get() is not None
+
+
+def stage(name:str):
+    inst = _active.get()
+    if inst is None: return _NULL_STAGE
+    return inst.stage(name)
+
+
+def count(name:str, value:int=1):
+    inst = _active.get()
+    if inst is not None: inst.count(name, value)
+
+
+def instrumented(name:Union[str,None]=None):
+    # Times every call of the decorated function as a stage (by default, named after the function)
+    def decorator(func):
+        stage_name = func.__name__ if name is None else name
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            inst = _active.get()
+            if inst is None: return func(*args, **kwargs)
+            with inst.stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
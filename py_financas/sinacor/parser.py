@@ -3,7 +3,8 @@
 # STDLib
 import re
 from datetime import datetime
-from typing import Dict, List, Union, Tuple, Set
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Union, Tuple, Set, Iterator
 
 # PIP
 import pdfplumber
@@ -11,6 +12,8 @@ import pandas as pd
 from numpy import nan
 
 # This package
+from py_financas.sinacor.cache import PageCache
+from py_financas.sinacor import instrumentation
 from py_financas.sinacor.types import to_DC, to_float, \
     NotaCorretagem, Operacao, Corretora, Impostos, Custos, Totais
 
@@ -37,6 +40,17 @@ PRECO_AJUSTE = f'\s+({num})'
 VALOR_OPERACAO_AJUSTE = f'\s+({num})'
 DC = '\s+(D|C)'
 
+# Amount of pages of a single file extracted by each task of the parallel reader
+PAGES_PER_TASK = 32
+
+# Spans (start, end) of the header, body and footer sections of each page, as located by segment_pages
+SECTIONS = List[Tuple[Tuple[int,int],Union[Tuple[int,int],None],Tuple[int,int]]]
+
+# Anchor lines of the sections of a page
+BODY_ANCHOR = 'Negócios realizados\n'
+BODY_END_ANCHOR = '\nResumo dos'
+FOOTER_ANCHOR = 'Resumo dos Neg'
+
 rgx_header = re.compile(
     '^NOTA DE CORRETAGEM\n'
     +ignore_line
@@ -51,13 +65,6 @@ rgx_header = re.compile(
     +'([^\n]+)\n'  # Cliente
 )
 
-rgx_body = re.compile(
-    'Negócios realizados\n'
-    +'Q'+ignore_line
-    +'((.*\n)+)'
-    +'Resumo dos'+ignore_line
-)
-
 rgx_op = re.compile(
     f'^{Q}{NEGOCIACAO}{CV}{TIPO_MERCADO}{TITULO}{TIPO_TITULO}{OBS}{QUANTIDADE}{PRECO_AJUSTE}{VALOR_OPERACAO_AJUSTE}{DC}$'
 )
@@ -90,13 +97,93 @@ rgx_footer = re.compile(
 #######################################################################################################################
 
 
-def read_pages(all_files:List[str]) -> List[str]:
-    all_pages = []
+def _read_page_range(filename:str, start:int, stop:int) -> List[str]:
+    with pdfplumber.open(filename) as pdf:
+        return [page.extract_text() for page in pdf.pages[start:stop]]
+
+
+def _extract_files(all_files:List[str], workers:Union[int,None]=None,
+                   pages_per_task:int=PAGES_PER_TASK) -> List[List[str]]:
+
+    # Serial extraction, in this process
+    if (workers is None) or (workers <= 1):
+        files_pages = []
+        for filename in all_files:
+            with pdfplumber.open(filename) as pdf:
+                files_pages.append([page.extract_text() for page in pdf.pages])
+        return files_pages
+
+    # Split each file in ranges of pages, in the order they appear
+    tasks = []
+    for num_file, filename in enumerate(all_files):
+        with pdfplumber.open(filename) as pdf:
+            num_pages = len(pdf.pages)
+        for start in range(0, num_pages, pages_per_task):
+            tasks.append((num_file, filename, start, min(start + pages_per_task, num_pages)))
+    files_pages = [[] for _ in all_files]
+    if len(tasks) == 0: return files_pages
+
+    # Extract the ranges in a process pool. The results are collected in the order of the tasks,
+    # so the position of each page (the dataset_page) is the same as in the serial extraction
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        num_files = [t[0] for t in tasks]
+        ranges = executor.map(_read_page_range, *zip(*[t[1:] for t in tasks]))
+        for num_file, pages in zip(num_files, ranges):
+            files_pages[num_file].extend(pages)
+    return files_pages
+
+
+@instrumentation.instrumented()
+def read_pages(all_files:List[str], workers:Union[int,None]=None,
+               pages_per_task:int=PAGES_PER_TASK, cache:Union[PageCache,None]=None) -> List[str]:
+
+    # Recover the files already extracted from the cache
+    keys = [None] * len(all_files)
+    files_pages = [None] * len(all_files)
+    if cache is not None:
+        keys = [cache.key(filename) for filename in all_files]
+        files_pages = [cache.get(key) for key in keys]  #type:ignore
+
+    # Extract (and cache) only the missing files
+    missing = [i for i, pages in enumerate(files_pages) if pages is None]
+    extracted = _extract_files([all_files[i] for i in missing], workers=workers, pages_per_task=pages_per_task)
+    for i, pages in zip(missing, extracted):
+        files_pages[i] = pages  #type:ignore
+        if cache is not None:
+            cache.put(keys[i], pages)  #type:ignore
+
+    all_pages = [page for pages in files_pages for page in pages]  #type:ignore
+    if instrumentation.enabled():
+        instrumentation.count('files_extracted', len(missing))
+        instrumentation.count('pages_extracted', sum(len(pages) for pages in extracted))
+        instrumentation.count('pages_read', len(all_pages))
+    return all_pages
+
+
+def iter_pages(all_files:List[str], cache:Union[PageCache,None]=None) -> Iterator[str]:
     for filename in all_files:
+
+        # Recover the file from the cache
+        key = None
+        if cache is not None:
+            key = cache.key(filename)
+            pages = cache.get(key)
+            if pages is not None:
+                yield from pages
+                continue
+
+        # Extract the file page by page. The text of the current file is kept only to be cached
+        pages = [] if cache is not None else None
         with pdfplumber.open(filename) as pdf:
             for page in pdf.pages:
-                all_pages.append(page.extract_text())
-    return all_pages
+                with instrumentation.stage('iter_pages'):
+                    text = page.extract_text()
+                if pages is not None:
+                    pages.append(text)
+                yield text
+                page.flush_cache()  # Do not keep the parsed objects of the pages already read
+        if pages is not None:
+            cache.put(key, pages)  #type:ignore
 
 
 def validate_matches(valid_pages, matches):
@@ -111,20 +198,71 @@ def check_continuation(page):
     return 'C O N T I N U A . . .' in page
 
 
+def first_match(rgx:re.Pattern, text:str, span:Union[Tuple[int,int],None]=None) -> Union[Tuple[str,...],str,None]:
+    m = rgx.findall(text) if (span is None) else rgx.findall(text, *span)
+    return m[0] if (len(m) > 0) else None
+
+
+# SEGMENTER
+#######################################################################################################################
+
+
+def _body_section(page:str, anchor:int) -> Union[Tuple[int,int],None]:
+    # The lines between the line after the first usable BODY_ANCHOR (the "Q" line, with something else after the "Q")
+    # and the last line starting with "Resumo dos" (and something else) after it: from the start of the line after the
+    # "Q" line up to (and including) the line break before that "Resumo dos" line. None if there is no such span
+    while anchor >= 0:
+        q_line = anchor + len(BODY_ANCHOR)
+        q_line_end = page.find('\n', q_line)
+        if page.startswith('Q', q_line) and (q_line_end > q_line + 1):
+            start = q_line_end + 1
+            end = page.rfind(BODY_END_ANCHOR, start)
+            while end >= start:
+                rest = end + len(BODY_END_ANCHOR)
+                if page.find('\n', rest) > rest:
+                    return start, end + 1
+                end = page.rfind(BODY_END_ANCHOR, start, end)
+            return None  # No later anchor can have a "Resumo dos" line after it either
+        anchor = page.find(BODY_ANCHOR, anchor + 1)
+    return None
+
+
+def segment_page(page:str) -> Tuple[Tuple[int,int],Union[Tuple[int,int],None],Tuple[int,int]]:
+    # The spans (start, end) of the header (before the body anchor), body (its lines of operations)
+    # and footer (from the footer anchor) sections of the page, located once by their anchor lines
+    body_anchor = page.find(BODY_ANCHOR)
+    footer_anchor = page.find(FOOTER_ANCHOR)
+    return (
+        (0, len(page) if (body_anchor < 0) else body_anchor),
+        _body_section(page, body_anchor),
+        (len(page), len(page)) if (footer_anchor < 0) else (footer_anchor, len(page))
+    )
+
+
+@instrumentation.instrumented()
+def segment_pages(all_pages:List[str]) -> SECTIONS:
+    return [segment_page(p) for p in all_pages]
+
+
 # PARSERS
 #######################################################################################################################
 
 
-def parse_header(all_pages:List[str], valid_pages:List[bool]) -> List[Dict[str,str]]:
+@instrumentation.instrumented()
+def parse_header(all_pages:List[str], valid_pages:List[bool],
+                 sections:Union[SECTIONS,None]=None) -> List[Dict[str,str]]:
+    if sections is None: sections = segment_pages(all_pages)
 
     # Extract and validate the header sections in the pages
-    header_sections = [
-        m
-        if ((m := rgx_header.findall(p)) is None)
-        else (m[0] if (len(m) > 0) else None)
-        for p in all_pages
-    ]
+    header_sections = []
+    for p, (h, _, _) in zip(all_pages, sections):
+        m = first_match(rgx_header, p, h)
+        if (m is None) and (h[1] < len(p)): m = first_match(rgx_header, p)  # Body anchor inside the header
+        header_sections.append(m)
     validate_matches(valid_pages, header_sections)
+    if instrumentation.enabled():
+        instrumentation.count('header_matches', sum(m is not None for m in header_sections))
+        instrumentation.count('header_misses', sum(m is None for m in header_sections))
 
     # Parse the header objects
     headers = [
@@ -138,27 +276,30 @@ def parse_header(all_pages:List[str], valid_pages:List[bool]) -> List[Dict[str,s
     return headers
 
 
-def parse_body(all_pages:List[str], valid_pages:List[bool]) -> List[List[Union[Dict[str,str], None]]]:
+@instrumentation.instrumented()
+def parse_body(all_pages:List[str], valid_pages:List[bool],
+               sections:Union[SECTIONS,None]=None) -> List[List[Union[Dict[str,str], None]]]:
+    if sections is None: sections = segment_pages(all_pages)
 
     # Extract and validate the body sections in the pages
-    body_sections = [
-        m
-        if ((m := rgx_body.findall(p)) is None)
-        else (m[0] if (len(m) > 0) else None)
-        for p in all_pages
-    ]
-    body_sections = [b if (b is None) else b[0].splitlines() for b in body_sections]
+    body_sections = [b if (b is None) else p[b[0]:b[1]].splitlines() for p, (_, b, _) in zip(all_pages, sections)]
     validate_matches(valid_pages, body_sections)
 
-    # Extract and validate the operations sections in the body sections
+    # Extract and validate the operations sections in the body sections.
+    # The operation pattern is anchored to the whole line, so a single match is the same as findall
     operation_sections = [
         i if (i is None) else [
-            rgx_op.findall(j)
+            [] if ((m := rgx_op.match(j)) is None) else [m.groups('')]
             for j in i
         ]
         for i in body_sections
     ]
     validate_matches(valid_pages, operation_sections)
+    if instrumentation.enabled():
+        instrumentation.count('body_matches', sum(b is not None for b in body_sections))
+        instrumentation.count('body_misses', sum(b is None for b in body_sections))
+        instrumentation.count('operation_matches', sum(len(o) > 0 for ops in operation_sections if ops for o in ops))
+        instrumentation.count('operation_misses', sum(len(o) == 0 for ops in operation_sections if ops for o in ops))
 
     # Parse the body objects
     body_columns = [
@@ -172,7 +313,7 @@ def parse_body(all_pages:List[str], valid_pages:List[bool]) -> List[List[Union[D
         'dc_debito_credito',
     ]
     body = [
-        None if b is None else [dict(zip(body_columns, list(*l))) for l in b]
+        None if b is None else [dict(zip(body_columns, l[0] if l else ())) for l in b]
         for b in operation_sections
     ]
     validate_matches(valid_pages, body)
@@ -186,16 +327,18 @@ def parse_body(all_pages:List[str], valid_pages:List[bool]) -> List[List[Union[D
     return body  #type:ignore
 
 
-def parse_footer(all_pages:List[str], valid_pages:List[bool]) -> Tuple[List[Union[Dict[str,str],None]],List[bool]]:
+@instrumentation.instrumented()
+def parse_footer(all_pages:List[str], valid_pages:List[bool],
+                 sections:Union[SECTIONS,None]=None) -> Tuple[List[Union[Dict[str,str],None]],List[bool]]:
+    if sections is None: sections = segment_pages(all_pages)
 
     # Extract and validate the footer sections in the pages
-    footer_sections = [
-        m
-        if ((m := rgx_footer.findall(p)) is None)
-        else (m[0] if (len(m) > 0) else None)
-        for p in all_pages
-    ]
+    footer_sections = [first_match(rgx_footer, p, f) for p, (_, _, f) in zip(all_pages, sections)]
     footer_continuation = [check_continuation(p) for p in all_pages]
+    if instrumentation.enabled():
+        instrumentation.count('footer_matches', sum(m is not None for m in footer_sections))
+        instrumentation.count('footer_misses', sum(m is None for m in footer_sections))
+        instrumentation.count('continuation_pages', sum(footer_continuation))
     footer_sections = [('' if cont else m) if (m is None) else m
                        for m,cont in zip(footer_sections, footer_continuation)]
     validate_matches(valid_pages, footer_sections)
@@ -230,8 +373,9 @@ def parse_footer(all_pages:List[str], valid_pages:List[bool]) -> Tuple[List[Unio
     return footer, footer_continuation
 
 
-def _base_parse_notas_corretagem(all_pages:List[str]) -> Tuple[List[Union[Dict[str,str],None]],
-                                                               Set[str],Set[str],Set[str]]:
+@instrumentation.instrumented()
+def _base_parse_notas_corretagem(all_pages:List[str], first_page:int=0) -> Tuple[List[Union[Dict[str,str],None]],
+                                                                                 Set[str],Set[str],Set[str]]:
 
     # Prepare the buffers
     valid_pages = [(len(p.strip()) > 300) for p in all_pages]
@@ -240,13 +384,14 @@ def _base_parse_notas_corretagem(all_pages:List[str]) -> Tuple[List[Union[Dict[s
     body_columns = None
     footer_columns = None
 
-    # Parse the sections
-    header = parse_header(all_pages, valid_pages)
-    body = parse_body(all_pages, valid_pages)
-    footer, footer_continuation = parse_footer(all_pages, valid_pages)
+    # Locate the sections of the pages just once, and parse each of them
+    sections = segment_pages(all_pages)
+    header = parse_header(all_pages, valid_pages, sections)
+    body = parse_body(all_pages, valid_pages, sections)
+    footer, footer_continuation = parse_footer(all_pages, valid_pages, sections)
 
     # Join as a single object
-    pos = -1
+    pos = first_page - 1
     for h,b,f,cont,p in zip(header,body,footer,footer_continuation,all_pages):
         pos += 1
 
@@ -279,162 +424,243 @@ def _base_parse_notas_corretagem(all_pages:List[str]) -> Tuple[List[Union[Dict[s
 
     # Validate the entire dataset
     validate_matches(valid_pages, notas_corretagem)
+    if instrumentation.enabled():
+        instrumentation.count('valid_pages', sum(valid_pages))
+        instrumentation.count('invalid_pages', len(valid_pages) - sum(valid_pages))
     return notas_corretagem, header_columns, body_columns, footer_columns  #type:ignore
 
 
-def parse_notas_corretagem(all_files:List[str]) -> List[NotaCorretagem]:
+def _build_nota_corretagem(nota_numero:str, pages:List[Dict],
+                           header_columns:Set[str], footer_columns:Set[str]) -> NotaCorretagem:
+
+    if len(pages) == 1:
+        last_page_footer = pages[0]
+
+    # Validate this multi-page Nota de Corretagem
+    else:
+
+        # Each page should appear just once
+        assert len(pages) == len({p['nota_folha'] for p in pages}), f'REPEATED PAGES IN NOTA {nota_numero}'
+
+        # All the values in each Header column must be equal
+        for col in header_columns:
+            if col == 'nota_folha': continue  # No need to validate the number of the page
+            values = [p[col] for p in pages]
+            assert values.count(values[0]) == len(values), f'DIFFERENT VALUES FOR HEADER COLUMN {col} OF NOTA {nota_numero}: {pd.Series(values).unique()}'
+
+        # All pages must have operations
+        for p in pages:
+            assert len(p['operations']) > 0, f'NO OPERATIONS ON PAGE {p["nota_folha"]} OF NOTA {nota_numero}'
+
+        # Only a single page (the last) should gave the footer
+        last_page = max(int(p['nota_folha']) for p in pages)
+        assert last_page > 1, f'SINGLE PAGE IN NOTA {nota_numero}, THAT HAS {len(pages)} ROWS!'
+        middle_pages = [p for p in pages if p['nota_folha'] != str(last_page)]
+        last_pages = [p for p in pages if p['nota_folha'] == str(last_page)]
+        assert len(last_pages) == 1, f'MORE THAN ONE LAST PAGE {last_page} IN NOTA {nota_numero}'
+        last_page_footer = last_pages[0]
+        for col in footer_columns:
+            null_values = {nan if pd.isnull(v := p.get(col, nan)) else v for p in middle_pages}
+            assert null_values == {nan}, f'NON-NULL VALUES IN FOOTER COLUMN {col} OF THE MIDDLE PAGES OF NOTA {nota_numero}: {null_values}'
+            assert not pd.isnull(last_page_footer.get(col, nan)), f'NULL VALUE IN FOOTER COLUMN {col} OF THE LAST PAGE OF NOTA {nota_numero}'
+
+    # This Nota de Corretagem has passed the group validations. Convert it to a NotaCorretagem object
+    # The footer columns missing from the last page are null, as in a table of all the pages
+    lr = dict.fromkeys(footer_columns or [], nan)
+    lr.update(last_page_footer)
+    fp = pages[0]
+    dataset_page = str(fp['dataset_page'])
+    try:
+
+        # Header
+        _raw = fp['raw_page'].strip()
+        nota_numero = int(fp['nota_numero'].strip())
+        numero_nota_substitutiva = lr['nota_substituida']
+        numero_nota_substitutiva = '' if pd.isnull(numero_nota_substitutiva) else numero_nota_substitutiva.strip()
+        if numero_nota_substitutiva == '': numero_nota_substitutiva = -1
+        numero_nota_substitutiva = int(numero_nota_substitutiva)
+        nota_data_pregao = datetime.strptime(fp['nota_data'].strip(), '%d/%m/%Y').date()
+        nota_data_liquidacao = datetime.strptime(lr['nota_data_liquido'].strip(), '%d/%m/%Y').date()
+        cliente = fp['cliente'].strip()
+        cnpj = fp['corretora_cnpj'].strip()
+        estado = lr['corretora_estado'].lower().strip()
+
+        # Corretora
+        corretora = Corretora(
+            nome=fp['corretora_nome'].strip(),
+            cnpj=str(''.join(i for i in cnpj if i.isdigit())).split('.')[0],
+            estado={'são paulo': 'SP', 'rio de janeiro': 'RJ'}[estado]  #type:ignore
+        )
+
+        # Footer
+        taxes = Impostos(
+            iss=to_float(lr['val_iss']),
+            iss_DC=to_DC(lr['dc_iss'], 'debito'),  #type:ignore
+            irrf=to_float(lr['val_irrf']),
+            irrf_base=to_float(lr['val_base_irrf']),
+            irrf_DC=to_DC(lr['dc_irrf'], 'debito')  #type:ignore
+        )
+        costs = Custos(
+            taxa_liquidacao=to_float(lr['val_taxa_liquidacao']),
+            taxa_liquidacao_DC=to_DC(lr['dc_taxa_liquidacao'], 'debito'),  #type:ignore
+            taxa_registro=to_float(lr['val_taxa_registro']),
+            taxa_registro_DC=to_DC(lr['dc_taxa_registro'], 'debito'),  #type:ignore
+            taxa_termo_opcoes=to_float(lr['val_taxa_termo_opcoes']),
+            taxa_termo_opcoes_DC=to_DC(lr['dc_taxa_termo_opcoes'], 'debito'),  #type:ignore
+            taxa_ana=to_float(lr['val_taxa_ana']),
+            taxa_ana_DC=to_DC(lr['dc_taxa_ana'], 'debito'),  #type:ignore
+            emolumentos=to_float(lr['val_emolumentos']),
+            emolumentos_DC=to_DC(lr['dc_emolumentos'], 'debito'),  #type:ignore
+            clearing=to_float(lr['val_clearing']),
+            clearing_DC=to_DC(lr['dc_clearing'], 'debito'),  #type:ignore
+            execucao=to_float(lr['val_execucao']),
+            execucao_DC=to_DC(lr['dc_execucao'], 'debito'),  #type:ignore
+            execucao_casa=to_float(lr['val_execucao_casa']),
+            execucao_casa_DC=to_DC(lr['dc_execucao_casa'], 'debito'),  #type:ignore
+            outras=to_float(lr['val_outras']),
+            outras_DC=to_DC(lr['dc_outras'], 'debito'),  #type:ignore
+        )
+        totals = Totais(
+            liquido=to_float(lr['val_liquido']),
+            liquido_DC=to_DC(lr['dc_liquido'], 'credito'),  #type:ignore
+            vendas_vista=to_float(lr['val_vendas_vista']),
+            compras_vista=to_float(lr['val_compras_vista']),
+            opcoes_compras=to_float(lr['val_opcoes_compras']),
+            opcoes_vendas=to_float(lr['val_opcoes_vendas']),
+            debentures=to_float(lr['val_debentures']),
+            operacoes=to_float(lr['val_operacoes']),
+            operacoes_termo_bolsa=to_float(lr['val_operacoes_termo_bolsa']),
+            operacoes_titulos_publicos=to_float(lr['val_operacoes_titulos_publicos']),
+            valor_liquido_operacoes=to_float(lr['val_valor_liquido_operacoes']),
+            valor_liquido_operacoes_DC=to_DC(lr['dc_valor_liquido_operacoes'], 'credito'),  #type:ignore
+            cblc=to_float(lr['val_total_cblc']),
+            cblc_DC=to_DC(lr['dc_total_cblc'], 'credito'),  #type:ignore
+            bovespa_soma=to_float(lr['val_total_bovespa_soma']),
+            bovespa_soma_DC=to_DC(lr['dc_total_bovespa_soma'], 'credito'),  #type:ignore
+            corretagem_despesas=to_float(lr['val_total_corretagem_despesas']),
+            corretagem_despesas_DC=to_DC(lr['dc_total_corretagem_despesas'], 'credito'),  #type:ignore
+        )
+
+        # Operations
+        operations = []
+        for p in pages:
+            operations.append([])
+            for op in p['operations']:
+                operations[-1].append(Operacao.confiavel(
+                    _nota_numero=nota_numero, _nota_data_pregao=nota_data_pregao,
+                    _nota_corretora_cnpj=str(corretora.cnpj).split('.')[0],
+                    titulo=op['especificacao_titulo_0'].strip(),
+                    preco_ajuste=to_float(op['val_preco_ajuste']),
+                    quantidade=to_float(op['val_quantidade']),
+                    valor_operacao_ajuste=to_float(op['val_valor_operacao_ajuste']),
+                    compra_venda={'C': 'compra', 'V': 'venda'}[op['cv_compra_venda'].strip()],  #type:ignore
+                    debito_credito=to_DC(op['dc_debito_credito']),  #type:ignore
+                    tipo_mercado=op['tipo_mercado'].strip().lower(),
+                    negociacao=op['negociacao'].strip().lower(),
+                    especificacao_titulo=(
+                        op['especificacao_titulo_1'].strip().upper(),
+                        op['especificacao_titulo_2'].strip().upper(),
+                        op['especificacao_titulo_3'].strip().upper()),
+                    observacao=op['observacao'].strip()
+                ))
+
+        # Nota de Corretagem
+        return NotaCorretagem(
+            _raw_content=_raw, numero=nota_numero,
+            data_pregao=nota_data_pregao, data_liquidacao=nota_data_liquidacao,
+            numero_nota_substitutiva=numero_nota_substitutiva,
+            corretora=corretora, cliente=cliente, quantidade_folhas=len(pages),
+            operacoes=operations, impostos=taxes, custos=costs, totais=totals
+        )
+
+    except Exception as exp:
+        raise Exception(f'On page {dataset_page}:\n\t{exp}')
+
+
+@instrumentation.instrumented()
+def _group_notas_corretagem(notas_corretagem:List[Union[Dict,None]],
+                            header_columns:Set[str], footer_columns:Set[str]) -> List[NotaCorretagem]:
+
+    # Group the individually-validated pages by Número da Nota, in the order they appear
+    grouped_notas: Dict[str,List[Dict]] = {}
+    for nota in notas_corretagem:
+        if nota is None: continue
+        grouped_notas.setdefault(nota['nota_numero'], []).append(nota)
+
+    # Validate the many pages of the same Nota de Corretagem, in the order of their numbers
+    obj_notas_corretagem = []
+    for nota_numero in sorted(grouped_notas):
+        obj_notas_corretagem.append(_build_nota_corretagem(nota_numero, grouped_notas[nota_numero],
+                                                           header_columns, footer_columns))
+
+    if instrumentation.enabled():
+        instrumentation.count('notas_built', len(obj_notas_corretagem))
+        instrumentation.count('operations_built', sum(len(nota) for nota in obj_notas_corretagem))
+    return obj_notas_corretagem
+
+
+@instrumentation.instrumented()
+def parse_notas_corretagem(all_files:List[str], workers:Union[int,None]=None,
+                           cache:Union[PageCache,None]=None) -> List[NotaCorretagem]:
 
     # Read the files as strings
-    all_pages = read_pages(all_files)
+    all_pages = read_pages(all_files, workers=workers, cache=cache)
 
     # Base-parse and validate the file contents
     notas_corretagem, header_columns, body_columns, footer_columns = _base_parse_notas_corretagem(all_pages)
 
-    # Format the individually-validated Notas de Corretagem as a dataframe
-    df_notas_corretagem = pd.DataFrame([n for n in notas_corretagem if n is not None])
+    # Group and validate the many pages of the same Nota de Corretagem
+    return _group_notas_corretagem(notas_corretagem, header_columns, footer_columns)
 
-    # Group by Número da Nota and validate the many pages of the same Nota de Corretagem
-    obj_notas_corretagem = []
-    for nota_numero, sdf in df_notas_corretagem.groupby('nota_numero'):
-        if len(sdf) == 1:
-            lp_df = sdf
 
-        # Validate this multi-page Nota de Corretagem\
-        else:
+def iter_notas_corretagem(all_files:List[str], cache:Union[PageCache,None]=None) -> Iterator[NotaCorretagem]:
 
-            # Each page should appear just once
-            assert len(sdf) == len(sdf['nota_folha'].unique()), f'REPEATED PAGES IN NOTA {nota_numero}'
-
-            # All the values in each Header column must be equal
-            for col in header_columns:
-                if col == 'nota_folha': continue  # No need to validate the number of the page
-                values = sdf[col].unique()
-                assert len(values) == 1, f'DIFFERENT VALUES FOR HEADER COLUMN {col} OF NOTA {nota_numero}: {values}'
-
-            # All pages must have operations
-            for _, row in sdf.iterrows():
-                nota_folha = row['nota_folha']
-                assert len(row['operations']) > 0, f'NO OPERATIONS ON PAGE {nota_folha} OF NOTA {nota_numero}'
-
-            # Only a single page (the last) should gave the footer
-            last_page = sdf['nota_folha'].astype(int).max()
-            assert last_page > 1, f'SINGLE PAGE IN NOTA {nota_numero}, THAT HAS {len(sdf)} ROWS!'
-            null_df = sdf[sdf['nota_folha'] != str(last_page)][list(footer_columns)]
-            lp_df = sdf[sdf['nota_folha'] == str(last_page)][list(footer_columns)]
-            assert len(lp_df) == 1, f'MORE THAN ONE LAST PAGE {last_page} IN NOTA {nota_numero}'
-            for col in footer_columns:
-                null_values = set(null_df[col].unique())
-                assert null_values == {nan}, f'NON-NULL VALUES IN FOOTER COLUMN {col} OF THE MIDDLE PAGES OF NOTA {nota_numero}: {null_values}'
-                assert not lp_df[col].isnull().all(), f'NULL VALUE IN FOOTER COLUMN {col} OF THE LAST PAGE OF NOTA {nota_numero}'
-
-        # This Nota de Corretagem has passed the group validations. Convert it to a NotaCorretagem object
-        lr = lp_df.iloc[0]
-        dataset_page = str(sdf.iloc[0]['dataset_page'])
-        try:
+    # Prepare the buffers. Only the pages of the Notas de Corretagem still being read are kept
+    header_columns = None
+    body_columns = None
+    footer_columns = None
+    pending_notas: Dict[str,List[Dict]] = {}
+    finished_notas: Set[str] = set()
 
-            # Header
-            _raw = sdf.iloc[0]['raw_page'].strip()
-            nota_numero = int(sdf.iloc[0]['nota_numero'].strip())
-            numero_nota_substitutiva = lp_df['nota_substituida'].fillna('').iloc[0].strip()
-            if numero_nota_substitutiva == '': numero_nota_substitutiva = -1
-            numero_nota_substitutiva = int(numero_nota_substitutiva)
-            nota_data_pregao = datetime.strptime(sdf.iloc[0]['nota_data'].strip(), '%d/%m/%Y').date()
-            nota_data_liquidacao = datetime.strptime(lr['nota_data_liquido'].strip(), '%d/%m/%Y').date()
-            cliente = sdf.iloc[0]['cliente'].strip()
-            cnpj = sdf.iloc[0]['corretora_cnpj'].strip()
-            estado = lp_df['corretora_estado'].iloc[0].lower().strip()
-
-            # Corretora
-            corretora = Corretora(
-                nome=sdf.iloc[0]['corretora_nome'].strip(),
-                cnpj=str(''.join(i for i in cnpj if i.isdigit())).split('.')[0],
-                estado={'são paulo': 'SP', 'rio de janeiro': 'RJ'}[estado]  #type:ignore
-            )
-
-            # Footer
-            taxes = Impostos(
-                iss=to_float(lr['val_iss']),
-                iss_DC=to_DC(lr['dc_iss'], 'debito'),  #type:ignore
-                irrf=to_float(lr['val_irrf']),
-                irrf_base=to_float(lr['val_base_irrf']),
-                irrf_DC=to_DC(lr['dc_irrf'], 'debito')  #type:ignore
-            )
-            costs = Custos(
-                taxa_liquidacao=to_float(lr['val_taxa_liquidacao']),
-                taxa_liquidacao_DC=to_DC(lr['dc_taxa_liquidacao'], 'debito'),  #type:ignore
-                taxa_registro=to_float(lr['val_taxa_registro']),
-                taxa_registro_DC=to_DC(lr['dc_taxa_registro'], 'debito'),  #type:ignore
-                taxa_termo_opcoes=to_float(lr['val_taxa_termo_opcoes']),
-                taxa_termo_opcoes_DC=to_DC(lr['dc_taxa_termo_opcoes'], 'debito'),  #type:ignore
-                taxa_ana=to_float(lr['val_taxa_ana']),
-                taxa_ana_DC=to_DC(lr['dc_taxa_ana'], 'debito'),  #type:ignore
-                emolumentos=to_float(lr['val_emolumentos']),
-                emolumentos_DC=to_DC(lr['dc_emolumentos'], 'debito'),  #type:ignore
-                clearing=to_float(lr['val_clearing']),
-                clearing_DC=to_DC(lr['dc_clearing'], 'debito'),  #type:ignore
-                execucao=to_float(lr['val_execucao']),
-                execucao_DC=to_DC(lr['dc_execucao'], 'debito'),  #type:ignore
-                execucao_casa=to_float(lr['val_execucao_casa']),
-                execucao_casa_DC=to_DC(lr['dc_execucao_casa'], 'debito'),  #type:ignore
-                outras=to_float(lr['val_outras']),
-                outras_DC=to_DC(lr['dc_outras'], 'debito'),  #type:ignore
-            )
-            totals = Totais(
-                liquido=to_float(lr['val_liquido']),
-                liquido_DC=to_DC(lr['dc_liquido'], 'credito'),  #type:ignore
-                vendas_vista=to_float(lr['val_vendas_vista']),
-                compras_vista=to_float(lr['val_compras_vista']),
-                opcoes_compras=to_float(lr['val_opcoes_compras']),
-                opcoes_vendas=to_float(lr['val_opcoes_vendas']),
-                debentures=to_float(lr['val_debentures']),
-                operacoes=to_float(lr['val_operacoes']),
-                operacoes_termo_bolsa=to_float(lr['val_operacoes_termo_bolsa']),
-                operacoes_titulos_publicos=to_float(lr['val_operacoes_titulos_publicos']),
-                valor_liquido_operacoes=to_float(lr['val_valor_liquido_operacoes']),
-                valor_liquido_operacoes_DC=to_DC(lr['dc_valor_liquido_operacoes'], 'credito'),  #type:ignore
-                cblc=to_float(lr['val_total_cblc']),
-                cblc_DC=to_DC(lr['dc_total_cblc'], 'credito'),  #type:ignore
-                bovespa_soma=to_float(lr['val_total_bovespa_soma']),
-                bovespa_soma_DC=to_DC(lr['dc_total_bovespa_soma'], 'credito'),  #type:ignore
-                corretagem_despesas=to_float(lr['val_total_corretagem_despesas']),
-                corretagem_despesas_DC=to_DC(lr['dc_total_corretagem_despesas'], 'credito'),  #type:ignore
-            )
-
-            # Operations
-            operations = []
-            for _, row in sdf.iterrows():
-                operations.append([])
-                for op in row['operations']:
-                    operations[-1].append(Operacao(
-                        _nota_numero=nota_numero, _nota_data_pregao=nota_data_pregao,
-                        _nota_corretora_cnpj=str(corretora.cnpj).split('.')[0],
-                        titulo=op['especificacao_titulo_0'].strip(),
-                        preco_ajuste=to_float(op['val_preco_ajuste']),
-                        quantidade=to_float(op['val_quantidade']),
-                        valor_operacao_ajuste=to_float(op['val_valor_operacao_ajuste']),
-                        compra_venda={'C': 'compra', 'V': 'venda'}[op['cv_compra_venda'].strip()],  #type:ignore
-                        debito_credito=to_DC(op['dc_debito_credito']),  #type:ignore
-                        tipo_mercado=op['tipo_mercado'].strip().lower(),
-                        negociacao=op['negociacao'].strip().lower(),
-                        especificacao_titulo=(
-                            op['especificacao_titulo_1'].strip().upper(),
-                            op['especificacao_titulo_2'].strip().upper(),
-                            op['especificacao_titulo_3'].strip().upper()),
-                        observacao=op['observacao'].strip()
-                    ))
-
-            # Nota de Corretagem
-            obj_notas_corretagem.append(
-                NotaCorretagem(
-                    _raw_content=_raw, numero=nota_numero,
-                    data_pregao=nota_data_pregao, data_liquidacao=nota_data_liquidacao,
-                    numero_nota_substitutiva=numero_nota_substitutiva,
-                    corretora=corretora, cliente=cliente, quantidade_folhas=len(sdf),
-                    operacoes=operations, impostos=taxes, custos=costs, totais=totals
-                )
-            )
-
-        except Exception as exp:
-            raise Exception(f'On page {dataset_page}:\n\t{exp}')
+    # Read the files page by page
+    for pos, page in enumerate(iter_pages(all_files, cache=cache)):
+        instrumentation.count('pages_read')
 
-    return obj_notas_corretagem
+        # Base-parse and validate the page contents
+        try:
+            notas_corretagem, h_columns, b_columns, f_columns = _base_parse_notas_corretagem([page], first_page=pos)
+        except AssertionError as exp:
+            raise AssertionError(f'On page {pos}:\n\t{exp}')
+        nota = notas_corretagem[0]
+        if nota is None: continue  # Skip invalid pages
+
+        # Assert column definition stability
+        if header_columns is None:
+            header_columns = h_columns
+            body_columns = b_columns
+        else:
+            assert header_columns == h_columns
+            assert body_columns == b_columns
+        if f_columns is not None:
+            if footer_columns is None:
+                footer_columns = f_columns
+            else: assert footer_columns == f_columns
+
+        # Buffer the page with the other pages of the same Nota de Corretagem
+        nota_numero = nota['nota_numero']
+        assert nota_numero not in finished_notas, f'PAGE {nota["nota_folha"]} OF NOTA {nota_numero} AFTER ITS LAST PAGE'
+        pending_notas.setdefault(nota_numero, []).append(nota)
+
+        # The page with the footer is the last page of the Nota de Corretagem. Validate and emit it
+        if not nota['has_continuation']:
+            finished_notas.add(nota_numero)
+            with instrumentation.stage('_build_nota_corretagem'):
+                obj_nota_corretagem = _build_nota_corretagem(nota_numero, pending_notas.pop(nota_numero),
+                                                             header_columns, footer_columns)  #type:ignore
+            if instrumentation.enabled():
+                instrumentation.count('notas_built')
+                instrumentation.count('operations_built', len(obj_nota_corretagem))
+            yield obj_nota_corretagem
+
+    # All the Notas de Corretagem must have been completed
+    assert len(pending_notas) == 0, f'NOTAS WITHOUT A LAST PAGE: {sorted(pending_notas)}'
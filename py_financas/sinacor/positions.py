@@ -1,16 +1,21 @@
 
 
 # STDLib
-from typing import List, Dict, Tuple
+import pickle
+from datetime import date
+from typing import List, Dict, Tuple, Union, Set
 
 # PIP
 from pandas import read_excel, to_datetime
 
 # This package
+from py_financas.sinacor.cache import PageCache
+from py_financas.sinacor import instrumentation
 from py_financas.sinacor.parser import parse_notas_corretagem
 from py_financas.sinacor.types import Operacao, Posicao, NotaCorretagem
 
 
+@instrumentation.instrumented()
 def parse_operacoes_manuais(arquivo_excel_operacoes_manuais:str) -> Dict[Tuple[str,str],Operacao]:
 
     # Read and normalize the data
@@ -50,6 +55,53 @@ def parse_operacoes_manuais(arquivo_excel_operacoes_manuais:str) -> Dict[Tuple[s
     return operacoes_manuais
 
 
+def _nova_posicao(cnpj:str, op:Operacao) -> Posicao:
+    return Posicao(
+        corretora=cnpj,
+        chave_operacao_abertura=op.chave,
+        titulo=op.titulo,
+        especificacao_titulo=op.especificacao_titulo,
+        observacao_titulo=op.observacao,
+        tipo_mercado=op.tipo_mercado,
+
+        data_abertura=op._nota_data_pregao,
+        data_fechamento=None,
+
+        quantidade=op.quantidade,
+        valor_unitario=op.preco_ajuste
+    )
+
+
+def _aplica_operacao(posicoes:List[Posicao], cnpj:str, op:Operacao):
+
+    # Atualizando a posição aberta a partir da operação
+    if (len(posicoes) > 0) and posicoes[-1].aberta:
+        posicoes[-1].atualizar(op)
+
+    # Criacao de nova posicao do titulo (a primeira, ou após fechamento)
+    else:
+        posicoes.append(_nova_posicao(cnpj, op))
+
+
+def _ordem_operacao(op:Operacao) -> Tuple[date,str]:
+    # Same order of the operations of a title in parse_posicoes_de_notas_de_corretagem,
+    # where the notas are sorted by their keys (date, corretora and number, as a string)
+    return op._nota_data_pregao, str(op._nota_numero)
+
+
+def _agrupa_operacoes(obj_notas_corretagem:List[NotaCorretagem]) -> Dict[Tuple[str,str],List[Operacao]]:
+    operacoes = {}
+    for nota in sorted(obj_notas_corretagem):
+        for folha in nota.operacoes:
+            for op in folha:
+                chave = (str(nota.corretora.cnpj).split('.')[0],op.chave_titulo)
+                if chave in operacoes:
+                    operacoes[chave].append(op)
+                else: operacoes[chave] = [op]
+    return operacoes
+
+
+@instrumentation.instrumented()
 def parse_posicoes_de_operacoes(todas_as_operacoes:Dict[Tuple[str,str],List[Operacao]]) -> List[Posicao]:
 
     # Parse the positions
@@ -57,87 +109,35 @@ def parse_posicoes_de_operacoes(todas_as_operacoes:Dict[Tuple[str,str],List[Oper
     for chave, operacoes in todas_as_operacoes.items():
         cnpj, titulo = chave
         cnpj = str(cnpj).split('.')[0]
-        operacoes = sorted(operacoes, key=lambda op: op._nota_data_pregao)
-
-        # Criando a posição inicial
-        if chave not in posicoes:
-            op = operacoes[0]
-            posicoes[chave] = [
-                Posicao(
-                    corretora=str(cnpj).split('.')[0],
-                    chave_operacao_abertura=op.chave,
-                    titulo=op.titulo,
-                    especificacao_titulo=op.especificacao_titulo,
-                    observacao_titulo=op.observacao,
-                    tipo_mercado=op.tipo_mercado,
-
-                    data_abertura=op._nota_data_pregao,
-                    data_fechamento=None,
-
-                    quantidade=op.quantidade,
-                    valor_unitario=op.preco_ajuste
-                )
-            ]
-            operacoes = operacoes[1:]  # Evitamos inserir a primeira OP novamente
-
-        # Atualizando a posição a partir das operações
-        for op in operacoes:
-            if posicoes[chave][-1].aberta:
-                posicoes[chave][-1].atualizar(op)
-                continue
-
-            # Criacao de nova posicao do titulo, após fechamento
-            else:
-                posicoes[chave].append(
-                    Posicao(
-                        corretora=cnpj,
-                        chave_operacao_abertura=op.chave,
-                        titulo=op.titulo,
-                        especificacao_titulo=op.especificacao_titulo,
-                        observacao_titulo=op.observacao,
-                        tipo_mercado=op.tipo_mercado,
-
-                        data_abertura=op._nota_data_pregao,
-                        data_fechamento=None,
-
-                        quantidade=op.quantidade,
-                        valor_unitario=op.preco_ajuste
-                    )
-                )
-
-    return sorted(sum(posicoes.values(), []))
+        posicoes[chave] = []
+        for op in sorted(operacoes, key=lambda op: op._nota_data_pregao):
+            _aplica_operacao(posicoes[chave], cnpj, op)
+
+    posicoes = sorted(sum(posicoes.values(), []))
+    if instrumentation.enabled():
+        instrumentation.count('operations_applied', sum(len(ops) for ops in todas_as_operacoes.values()))
+        instrumentation.count('positions_built', len(posicoes))
+    return posicoes
 
 
 def parse_posicoes_de_notas_de_corretagem(obj_notas_corretagem:List[NotaCorretagem]) -> List[Posicao]:
 
     # Extract the operations from the automatic files
-    operacoes_automaticas = {}
-    for nota in sorted(obj_notas_corretagem):
-        for folha in nota.operacoes:
-            for op in folha:
-                chave = (str(nota.corretora.cnpj).split('.')[0],op.chave_titulo)
-                if chave in operacoes_automaticas:
-                    operacoes_automaticas[chave].append(op)
-                else: operacoes_automaticas[chave] = [op]
+    operacoes_automaticas = _agrupa_operacoes(obj_notas_corretagem)
 
     return parse_posicoes_de_operacoes(operacoes_automaticas)
 
 
 def parse_posicoes(arquivos_pdf_notas_corretagem:List[str],
-                   arquivos_excel_operacoes_manuais:List[str]) -> List[Posicao]:
+                   arquivos_excel_operacoes_manuais:List[str],
+                   workers:Union[int,None]=None,
+                   cache:Union[PageCache,None]=None) -> List[Posicao]:
 
     # Parse all the Notas de Corretagem as NotaCorretagem objects
-    obj_notas_corretagem = parse_notas_corretagem(arquivos_pdf_notas_corretagem)
+    obj_notas_corretagem = parse_notas_corretagem(arquivos_pdf_notas_corretagem, workers=workers, cache=cache)
 
     # Extract the operations from the automatic files
-    operacoes_automaticas = {}
-    for nota in sorted(obj_notas_corretagem):
-        for folha in nota.operacoes:
-            for op in folha:
-                chave = (str(nota.corretora.cnpj).split('.')[0],op.chave_titulo)
-                if chave in operacoes_automaticas:
-                    operacoes_automaticas[chave].append(op)
-                else: operacoes_automaticas[chave] = [op]
+    operacoes_automaticas = _agrupa_operacoes(obj_notas_corretagem)
 
     # Extract the operations from the manual files
     operacoes_manuais = {}
@@ -156,3 +156,93 @@ def parse_posicoes(arquivos_pdf_notas_corretagem:List[str],
                           for k,v in todas_as_operacoes.items()}
 
     return parse_posicoes_de_operacoes(todas_as_operacoes)
+
+
+# INCREMENTAL STATE
+#######################################################################################################################
+
+
+# Persistent state of the positions, updated only with the operations not yet applied.
+# The operations of each title are kept, so an operation older than the last one applied to its title
+# (a late Nota de Corretagem) replays only the history of that title
+class EstadoPosicoes():
+
+    def __init__(self):
+        self.operacoes: Dict[Tuple[str,str],List[Operacao]] = {}
+        self.posicoes: Dict[Tuple[str,str],List[Posicao]] = {}
+        self.notas_aplicadas: Set[str] = set()
+        self.reprocessamentos: int = 0
+
+    def __len__(self) -> int: return sum(len(v) for v in self.posicoes.values())
+
+    def __repr__(self) -> str:
+        return f'<ESTADO [{len(self.notas_aplicadas)}|{sum(len(v) for v in self.operacoes.values())}|{len(self)}]>'
+
+    def __str__(self) -> str: return self.__repr__()
+
+    def _reprocessa(self, chave:Tuple[str,str]):
+        cnpj = str(chave[0]).split('.')[0]
+        self.posicoes[chave] = []
+        for op in self.operacoes[chave]:
+            _aplica_operacao(self.posicoes[chave], cnpj, op)
+
+    @instrumentation.instrumented('EstadoPosicoes.aplicar_operacoes')
+    def aplicar_operacoes(self, novas_operacoes:Dict[Tuple[str,str],List[Operacao]]) -> Set[Tuple[str,str]]:
+        reprocessados = set()
+        anteriores: Dict[Tuple[str,str],List[Operacao]] = {}
+        try:
+            for chave, operacoes in novas_operacoes.items():
+                if len(operacoes) == 0: continue
+                cnpj = str(chave[0]).split('.')[0]
+                operacoes = sorted(operacoes, key=_ordem_operacao)
+                historico = self.operacoes.setdefault(chave, [])
+                posicoes = self.posicoes.setdefault(chave, [])
+                anteriores[chave] = list(historico)
+
+                # Operação tardia: anterior à última operação aplicada ao título. Reprocessamos o histórico do título
+                if (len(historico) > 0) and (_ordem_operacao(operacoes[0]) < _ordem_operacao(historico[-1])):
+                    historico.extend(operacoes)
+                    historico.sort(key=_ordem_operacao)
+                    self._reprocessa(chave)
+                    reprocessados.add(chave)
+
+                # Caso comum: aplicamos apenas as novas operações
+                else:
+                    historico.extend(operacoes)
+                    for op in operacoes:
+                        _aplica_operacao(posicoes, cnpj, op)
+
+        # Em caso de erro, restauramos os títulos alterados ao estado anterior às novas operações
+        except Exception:
+            for chave, historico in anteriores.items():
+                self.operacoes[chave] = historico
+                self._reprocessa(chave)
+            raise
+
+        self.reprocessamentos += len(reprocessados)
+        if instrumentation.enabled():
+            instrumentation.count('operations_applied', sum(len(ops) for ops in novas_operacoes.values()))
+            instrumentation.count('titles_reprocessed', len(reprocessados))
+        return reprocessados
+
+    def aplicar_notas(self, obj_notas_corretagem:List[NotaCorretagem]) -> Set[Tuple[str,str]]:
+
+        # Ignore the Notas de Corretagem already applied
+        novas_notas = [nota for nota in obj_notas_corretagem if nota.key not in self.notas_aplicadas]
+        reprocessados = self.aplicar_operacoes(_agrupa_operacoes(novas_notas))
+        self.notas_aplicadas.update(nota.key for nota in novas_notas)
+        return reprocessados
+
+    def lista_posicoes(self) -> List[Posicao]:
+        return sorted(sum(self.posicoes.values(), []))
+
+    def salvar(self, arquivo:str):
+        with open(arquivo, 'wb') as fout:
+            pickle.dump(self, fout)
+
+    @staticmethod
+    def carregar(arquivo:str) -> 'EstadoPosicoes':
+        with open(arquivo, 'rb') as fin:
+            estado = pickle.load(fin)
+        assert isinstance(estado, EstadoPosicoes), f'ARQUIVO {arquivo} NAO CONTEM UM ESTADO DE POSICOES'
+        return estado
@@ -1,9 +1,10 @@
 
 # STDLib
+import sys
 from time import time
 from itertools import cycle
 from datetime import date, timedelta
-from typing import Literal, Tuple, List, Dict, Union
+from typing import Literal, Tuple, List, Dict, Union, get_args
 
 # PIP
 from pydantic.dataclasses import dataclass, Field
@@ -14,6 +15,10 @@ from pydantic.dataclasses import dataclass, Field
 
 
 DC = Literal['debito', 'credito']
+CV = Literal['compra', 'venda', 'desdobramento']
+TM = Literal['vista', 'fracionario', 'prazo']
+NEG = Literal['bovespa', 'bovespa 1']
+VALORES_DC, VALORES_CV, VALORES_TM, VALORES_NEG = (frozenset(get_args(lit)) for lit in (DC, CV, TM, NEG))
 
 
 # UTILS
@@ -93,13 +98,43 @@ class Operacao():
     preco_ajuste: float
     quantidade: float
     valor_operacao_ajuste: float
-    compra_venda: Literal['compra', 'venda', 'desdobramento']
+    compra_venda: CV
     debito_credito: DC
-    tipo_mercado: Literal['vista', 'fracionario', 'prazo']
-    negociacao: Literal['bovespa', 'bovespa 1']
+    tipo_mercado: TM
+    negociacao: NEG
     especificacao_titulo: Tuple[str,str,str]
     observacao: str
 
+    @staticmethod
+    def confiavel(_nota_numero:int, _nota_data_pregao:date, _nota_corretora_cnpj:str,
+                  titulo:str, preco_ajuste:float, quantidade:float, valor_operacao_ajuste:float,
+                  compra_venda:CV, debito_credito:DC, tipo_mercado:TM, negociacao:NEG,
+                  especificacao_titulo:Tuple[str,str,str], observacao:str) -> 'Operacao':
+        # Trusted construction, for values already parsed and typed (as by the regex parser of the notas).
+        # Skips the pydantic validation, keeping only the checks of the literal fields,
+        # and interns the strings repeated across thousands of operations
+        assert compra_venda in VALORES_CV, f'INVALID COMPRA/VENDA: {compra_venda}'
+        assert debito_credito in VALORES_DC, f'INVALID DEBITO/CREDITO: {debito_credito}'
+        assert tipo_mercado in VALORES_TM, f'INVALID TIPO MERCADO: {tipo_mercado}'
+        assert negociacao in VALORES_NEG, f'INVALID NEGOCIACAO: {negociacao}'
+        op = object.__new__(Operacao)
+        op.__dict__.update(
+            _nota_numero=_nota_numero,
+            _nota_data_pregao=_nota_data_pregao,
+            _nota_corretora_cnpj=sys.intern(_nota_corretora_cnpj),
+            titulo=sys.intern(titulo),
+            preco_ajuste=preco_ajuste,
+            quantidade=quantidade,
+            valor_operacao_ajuste=valor_operacao_ajuste,
+            compra_venda=compra_venda,
+            debito_credito=debito_credito,
+            tipo_mercado=sys.intern(tipo_mercado),
+            negociacao=sys.intern(negociacao),
+            especificacao_titulo=tuple(sys.intern(esp) for esp in especificacao_titulo),
+            observacao=sys.intern(observacao),
+        )
+        return op
+
     @property
     def chave_titulo(self) -> str:
         tm = self.tipo_mercado
@@ -267,6 +302,15 @@ class MomentoPosicao():
     @property
     def valor_total(self) -> float: return round(self.quantidade * self.valor_unitario, 2)
 
+    @staticmethod
+    def confiavel(chave_operacao:str, data:date, quantidade:float, valor_unitario:float,
+                  rendimento:float) -> 'MomentoPosicao':
+        # Trusted construction, for the moments computed by the Posicao itself. Skips the pydantic validation
+        mp = object.__new__(MomentoPosicao)
+        mp.__dict__.update(chave_operacao=chave_operacao, data=data, quantidade=quantidade,
+                           valor_unitario=valor_unitario, rendimento=rendimento)
+        return mp
+
 
 @dataclass
 class Posicao():
@@ -288,7 +332,7 @@ class Posicao():
 
     def __post_init__(self):
         self.historico.append(
-            MomentoPosicao(
+            MomentoPosicao.confiavel(
                 self.chave_operacao_abertura,
                 self.data_abertura,
                 self.quantidade,
@@ -401,7 +445,7 @@ class Posicao():
 
         # Anotamos a nova situação no histórico
         self.historico.append(
-            MomentoPosicao(
+            MomentoPosicao.confiavel(
                 op.chave,
                 data_pregao,
                 self.quantidade,
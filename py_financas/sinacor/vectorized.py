@@ -0,0 +1,192 @@
+
+
+# STDLib
+from typing import List, Dict, Tuple
+
+# PIP
+import numpy as np
+import pandas as pd
+
+# This package
+from py_financas.sinacor.types import Operacao, Posicao
+from py_financas.sinacor.positions import parse_posicoes_de_operacoes
+from py_financas.sinacor import instrumentation
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+# Columns of the DataFrames of positions, the same for both engines
+COLUNAS_POSICOES = [
+    'corretora', 'titulo', 'tipo_mercado', 'chave_titulo',
+    'especificacao_titulo', 'observacao_titulo', 'chave_operacao_abertura',
+    'data_abertura', 'data_fechamento',
+    'quantidade', 'valor_unitario', 'valor_total', 'rendimento',
+    'operacoes', 'fechamentos',
+]
+ORDEM_POSICOES = ['data_abertura', 'corretora', 'chave_titulo', 'data_fechamento']
+
+# UTILS
+#######################################################################################################################
+
+
+def _ordena_posicoes(df:pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(ORDEM_POSICOES, na_position='last', kind='mergesort').reset_index(drop=True)
+
+
+def posicoes_para_dataframe(posicoes:List[Posicao]) -> pd.DataFrame:
+    df = pd.DataFrame({
+        'corretora': [p.corretora for p in posicoes],
+        'titulo': [p.titulo for p in posicoes],
+        'tipo_mercado': [p.tipo_mercado for p in posicoes],
+        'chave_titulo': [p.chave_titulo for p in posicoes],
+        'especificacao_titulo': [p.especificacao_titulo for p in posicoes],
+        'observacao_titulo': [p.observacao_titulo for p in posicoes],
+        'chave_operacao_abertura': [p.chave_operacao_abertura for p in posicoes],
+        'data_abertura': pd.to_datetime([p.data_abertura for p in posicoes]),
+        'data_fechamento': pd.to_datetime([p.data_fechamento for p in posicoes]),
+        'quantidade': np.array([p.quantidade for p in posicoes], dtype=float),
+        'valor_unitario': np.array([p.valor_unitario for p in posicoes], dtype=float),
+        'valor_total': np.array([p.valor_total for p in posicoes], dtype=float),
+        'rendimento': np.array([p.rendimento for p in posicoes], dtype=float),
+        'operacoes': np.array([len(p.historico) for p in posicoes], dtype=np.int64),
+        'fechamentos': [dict(p.fechamentos) for p in posicoes],
+    }, columns=COLUNAS_POSICOES)
+    return _ordena_posicoes(df)
+
+
+def operacoes_para_dataframe(todas_as_operacoes:Dict[Tuple[str,str],List[Operacao]]) -> pd.DataFrame:
+    num_chaves, corretoras, operacoes = [], [], []
+    for num_chave, (chave, ops) in enumerate(todas_as_operacoes.items()):
+        num_chaves += [num_chave] * len(ops)
+        corretoras += [str(chave[0]).split('.')[0]] * len(ops)
+        operacoes += ops
+    return pd.DataFrame({
+        'num_chave': np.array(num_chaves, dtype=np.int64),
+        'corretora': corretoras,
+        'data': pd.to_datetime([op._nota_data_pregao for op in operacoes]),
+        'compra_venda': [op.compra_venda for op in operacoes],
+        'quantidade': np.array([op.quantidade for op in operacoes], dtype=float),
+        'preco_ajuste': np.array([op.preco_ajuste for op in operacoes], dtype=float),
+        'valor_operacao_ajuste': np.array([op.valor_operacao_ajuste for op in operacoes], dtype=float),
+        'operacao': pd.Series(operacoes, dtype=object),
+    })
+
+
+def _custo_medio_compras(abertura:np.ndarray, quantidade_anterior:np.ndarray, quantidade:np.ndarray,
+                         preco:np.ndarray, valor_agregado:np.ndarray) -> np.ndarray:
+    # Average cost after each purchase, rounded at the same points of Posicao.atualizar: the value of the position
+    # (average cost x quantity) is rounded to cents before the value of the purchase is added. The rounding makes the
+    # recurrence non-linear, so it runs over plain floats, one purchase after the other
+    valor_unitario, atual = [], 0.0
+    for abre, q_anterior, q, p, v in zip(abertura.tolist(), quantidade_anterior.tolist(), quantidade.tolist(),
+                                         preco.tolist(), valor_agregado.tolist()):
+        atual = p if abre else (round(atual * q_anterior, 2) + v) / q
+        valor_unitario.append(atual)
+    return np.array(valor_unitario, dtype=float)
+
+
+def _rendimentos_vendas(segmento:np.ndarray, datas:np.ndarray, rendimento_agregado:np.ndarray,
+                        segmentos:int) -> Tuple[List[float], List[Dict]]:
+    # Realized gains of each segment and its fechamentos (gains by date), from its sales in order. As in
+    # Posicao.atualizar, the running rendimento is rounded to cents before each gain is added
+    rendimento, fechamentos = [0.0] * segmentos, [{} for _ in range(segmentos)]
+    for seg, data, agregado in zip(segmento.tolist(), datas.tolist(), rendimento_agregado.tolist()):
+        rendimento[seg] = round(rendimento[seg], 2) + agregado
+        fechamentos[seg][data] = fechamentos[seg].get(data, 0.0) + agregado
+    return [round(r, 2) for r in rendimento], fechamentos
+
+
+# PAYLOAD
+#######################################################################################################################
+
+
+@instrumentation.instrumented()
+def parse_posicoes_vetorizadas(todas_as_operacoes:Dict[Tuple[str,str],List[Operacao]]) -> pd.DataFrame:
+
+    # Columnar operations, in the same order of the object engine (by title and date, stable on ties)
+    df = operacoes_para_dataframe(todas_as_operacoes)
+    if len(df) == 0: return pd.DataFrame(columns=COLUNAS_POSICOES)
+    df = df.sort_values(['num_chave', 'data'], kind='mergesort').reset_index(drop=True)
+    num_chave = df['num_chave'].to_numpy()
+    compra = (df['compra_venda'] == 'compra').to_numpy()
+    venda = (df['compra_venda'] == 'venda').to_numpy()
+    quantidade_op = df['quantidade'].to_numpy()
+
+    # Running quantity of each title
+    delta = np.where(compra, np.abs(quantidade_op), -np.abs(quantidade_op))
+    quantidade = pd.Series(delta).groupby(num_chave).cumsum().to_numpy()
+
+    # Segments (positions): a new one starts at the first operation of the title, or after a closing sale
+    primeira_da_chave = np.r_[True, num_chave[1:] != num_chave[:-1]]
+    fechamento = venda & (quantidade == 0)
+    abertura = primeira_da_chave | np.r_[False, fechamento[:-1]]
+
+    # Titles outside the columnar model run in the object engine: splits (desdobramentos), positions opened by a sale,
+    # non-positive operation quantities and short positions
+    irregular = (~(compra | venda)) | (abertura & ~compra) | (quantidade_op <= 0) | (quantidade < 0)
+    chaves_irregulares = np.unique(num_chave[irregular])
+    regular = ~np.isin(num_chave, chaves_irregulares)
+
+    frames = []
+    if regular.any():
+        r = df[regular].reset_index(drop=True)
+        compra, venda = compra[regular], venda[regular]
+        abertura, fechamento, quantidade = abertura[regular], fechamento[regular], quantidade[regular]
+        segmento = np.cumsum(abertura) - 1
+        preco = r['preco_ajuste'].to_numpy()
+        qtd = np.abs(r['quantidade'].to_numpy())
+
+        # Average cost, on the purchases (the opening included), carried forward over the sales
+        c = np.flatnonzero(compra)
+        quantidade_anterior = np.where(abertura, 0.0, np.r_[0.0, quantidade[:-1]])
+        valor_unitario = np.full(len(r), np.nan)
+        valor_unitario[c] = _custo_medio_compras(abertura[c], quantidade_anterior[c], quantidade[c], preco[c],
+                                                 np.abs(r['valor_operacao_ajuste'].to_numpy()[c]))
+        valor_unitario = pd.Series(valor_unitario).groupby(segmento).ffill().to_numpy()
+
+        # Realized gains on the sales, and fechamentos (realized gains by date) of each segment
+        v = np.flatnonzero(venda)
+        rendimento, fechamentos = _rendimentos_vendas(segmento[v], r['data'].dt.date.to_numpy()[v],
+                                                      (np.abs(preco[v]) - valor_unitario[v]) * qtd[v],
+                                                      int(segmento[-1]) + 1)
+
+        # One row per segment, from its first and last operations. Only the opening operations are read as objects
+        primeiro = np.flatnonzero(abertura)
+        ultimo = np.r_[primeiro[1:] - 1, len(r) - 1]
+        aberta = ~fechamento[ultimo]
+        ops_abertura = r['operacao'].to_numpy()[primeiro]
+        frames.append(pd.DataFrame({
+            'corretora': r['corretora'].to_numpy()[primeiro],
+            'titulo': [op.titulo for op in ops_abertura],
+            'tipo_mercado': [op.tipo_mercado for op in ops_abertura],
+            'chave_titulo': [f'{op.titulo}:{op.tipo_mercado}' for op in ops_abertura],
+            'especificacao_titulo': [op.especificacao_titulo for op in ops_abertura],
+            'observacao_titulo': [op.observacao for op in ops_abertura],
+            'chave_operacao_abertura': [op.chave for op in ops_abertura],
+            'data_abertura': r['data'].to_numpy()[primeiro],
+            'data_fechamento': np.where(aberta, np.datetime64('NaT'), r['data'].to_numpy()[ultimo]),
+            'quantidade': quantidade[ultimo],
+            'valor_unitario': valor_unitario[ultimo],
+            'valor_total': [round(vu * q, 2) for vu, q in zip(valor_unitario[ultimo].tolist(),
+                                                              quantidade[ultimo].tolist())],
+            'rendimento': rendimento,
+            'operacoes': ultimo - primeiro + 1,
+            'fechamentos': fechamentos,
+        }, columns=COLUNAS_POSICOES))
+        if instrumentation.enabled():
+            instrumentation.count('operations_applied', len(r))
+            instrumentation.count('positions_built', len(primeiro))
+
+    # Irregular titles, in the object engine
+    if len(chaves_irregulares) > 0:
+        instrumentation.count('titles_object_engine', len(chaves_irregulares))
+        chaves = list(todas_as_operacoes.keys())
+        frames.append(posicoes_para_dataframe(parse_posicoes_de_operacoes(
+            {chaves[i]: todas_as_operacoes[chaves[i]] for i in chaves_irregulares}
+        )))
+
+    frames = [f for f in frames if len(f) > 0]
+    if len(frames) == 0: return pd.DataFrame(columns=COLUNAS_POSICOES)
+    return _ordena_posicoes(pd.concat(frames, ignore_index=True))
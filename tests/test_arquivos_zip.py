@@ -0,0 +1,68 @@
+
+
+# STDLib
+import io
+import zipfile
+import tempfile
+
+# PIP
+import pytest
+
+# This package
+from py_financas import _utils
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+MEMBROS = {'a.xml': b'<ROOT>a</ROOT>', 'pasta/b.xml': b'<ROOT>' + b'b' * 200000 + b'</ROOT>'}
+
+
+# UTILS
+#######################################################################################################################
+
+
+def zip_em_bytes() -> bytes:
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as arquivo_zip:
+        for nome, conteudo in MEMBROS.items():
+            arquivo_zip.writestr(nome, conteudo)
+    return saida.getvalue()
+
+
+def zip_spooled(max_size:int) -> tempfile.SpooledTemporaryFile:
+    # As returned by baixa_arquivo: written block by block, and rewound
+    arquivo = tempfile.SpooledTemporaryFile(max_size=max_size)
+    arquivo.write(zip_em_bytes())
+    arquivo.seek(0)
+    return arquivo
+
+
+def sem_atributo(arquivo):
+    raise AttributeError('seekable')
+
+
+# TESTS
+#######################################################################################################################
+
+
+@pytest.mark.parametrize('max_size', [1024 * 1024, 1024], ids=['memoria', 'disco'])
+@pytest.mark.parametrize('sem_seekable', [False, True], ids=['atual', 'python_3_10'])
+def test_abre_zip_spooled(monkeypatch, max_size, sem_seekable):
+
+    # Up to Python 3.10, SpooledTemporaryFile has no seekable attribute (nor an io.IOBase one to inherit), which
+    # zipfile reads on each open
+    if sem_seekable:
+        monkeypatch.setattr(tempfile.SpooledTemporaryFile, 'seekable', property(sem_atributo), raising=False)
+
+    with zip_spooled(max_size) as arquivo:
+        assert _utils.lista_arquivos_zip_de_string(arquivo) == list(MEMBROS)
+        assert {nome: membro.read() for nome, membro in _utils.itera_arquivos_zip_de_string(arquivo)} == MEMBROS
+        assert _utils.le_arquivo_zip_de_string(arquivo, 'pasta/b.xml') == MEMBROS['pasta/b.xml']
+
+
+def test_abre_zip_bytes():
+    dados = zip_em_bytes()
+    for conteudo in (dados, bytearray(dados), memoryview(dados), io.BytesIO(dados)):
+        assert _utils.le_arquivo_zip_de_string(conteudo) == MEMBROS['a.xml']
@@ -0,0 +1,78 @@
+
+
+# STDLib
+import datetime
+import threading
+
+# PIP
+import numpy as np
+import pytest
+
+# This package
+from py_financas import _utils, constantes
+from py_financas._utils import calendario
+
+
+# UTILS
+#######################################################################################################################
+
+
+@pytest.fixture
+def calendario_limpo(monkeypatch):
+    # Each test starts from the default years, without a built calendar
+    monkeypatch.setattr(constantes, 'primeiro_ano_calendario', 1990)
+    monkeypatch.setattr(constantes, 'ultimo_ano_calendario', 2100)
+    monkeypatch.setattr(constantes, 'calendario_dias_uteis', None)
+
+
+# TESTS
+#######################################################################################################################
+
+
+@pytest.mark.parametrize('ano', [2004, 2019, 2020, 2021, 2024])
+def test_consciencia_negra_sem_pregao(calendario_limpo, ano):
+    assert datetime.date(ano, 11, 20) in calendario.feriados_do_ano(ano)
+
+
+@pytest.mark.parametrize('ano', [2003, 2022, 2023])
+def test_consciencia_negra_com_pregao(calendario_limpo, ano):
+    assert datetime.date(ano, 11, 20) not in calendario.feriados_do_ano(ano)
+
+
+def test_dias_uteis_em_novembro(calendario_limpo):
+    # 2019-11-20 (wednesday) and 2020-11-20 (friday) had no trading session in B3
+    assert not _utils.e_dia_util(datetime.date(2019, 11, 20))
+    assert not _utils.e_dia_util(datetime.date(2020, 11, 20))
+    assert _utils.ultimo_dia_util(datetime.date(2020, 11, 20)) == datetime.date(2020, 11, 19)
+    assert _utils.proximo_dia_util(datetime.date(2019, 11, 20)) == datetime.date(2019, 11, 21)
+    assert calendario.conta_dias_uteis(datetime.date(2019, 11, 18), datetime.date(2019, 11, 25)) == 4
+    assert _utils.e_dia_util(datetime.date(2022, 11, 21))
+
+
+def test_calendario_ampliado(calendario_limpo):
+    # Dates outside the default years widen the calendar, in a single build covering both ends
+    assert calendario.conta_dias_uteis(datetime.date(1985, 1, 1), datetime.date(2150, 1, 1)) > 0
+    assert (constantes.primeiro_ano_calendario, constantes.ultimo_ano_calendario) == (1985, 2150)
+    feriados = calendario.lista_feriados(datetime.date(1985, 1, 1), datetime.date(2150, 12, 31))
+    assert np.datetime64('1985-04-05') in feriados  # Good Friday
+    assert np.datetime64('2150-12-25') in feriados
+
+
+def test_calendario_nunca_vazio_entre_threads(calendario_limpo):
+
+    # While other threads widen the calendar, readers always find a calendar (never None) covering their dates
+    erros = []
+    inicio = threading.Barrier(8)
+
+    def amplia(ano):
+        inicio.wait()
+        for deslocamento in range(20):
+            if _utils.e_dia_util(datetime.date(2019, 11, 20)):
+                erros.append(ano)
+            _utils.e_dia_util(datetime.date(ano + deslocamento, 1, 2))
+
+    threads = [threading.Thread(target=amplia, args=(ano,)) for ano in (1900, 1950, 2150, 2200, 1800, 2300, 1700, 2400)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert erros == []
+    assert isinstance(constantes.calendario_dias_uteis, np.busdaycalendar)
@@ -0,0 +1,155 @@
+
+
+# STDLib
+import os
+import re
+import gzip
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# PIP
+import pytest
+import requests
+
+# This package
+from py_financas._utils import downloads
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+BLOCO = 8192
+DADOS = os.urandom(BLOCO * 40)
+CORTE = 100000  # Bytes sent by the first (interrupted) response of each document
+
+
+# UTILS
+#######################################################################################################################
+
+
+class ServidorInstavel():
+    """
+    HTTP server whose first response of each document is interrupted. The path sets how it behaves:
+    - simples: resumes with the requested range
+    - gzip: compresses the document even when asked not to (so it can not be resumed)
+    - trecho: answers the resume with the wrong range (the whole document)
+    - completo: sends the whole document, but announces 10 bytes more, then refuses the resume (416)
+    - instavel: answers 503 to the first request
+    - ausente: answers 404
+    The requests are recorded, per path, as (Range, Accept-Encoding)
+    """
+
+    def __init__(self):
+        self.pedidos = {}
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), self._tratador())
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+
+    def url(self, caminho:str) -> str: return 'http://127.0.0.1:{}/{}'.format(self._servidor.server_port, caminho)
+
+    def encerra(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def _tratador(self):
+        pedidos = self.pedidos
+
+        class Tratador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            def log_message(self, *args): pass
+
+            def _envia(self, codigo:int, corpo:bytes, tamanho:int=None, corte:int=None, **cabecalhos):
+                self.send_response(codigo)
+                for nome, valor in cabecalhos.items():
+                    self.send_header(nome.replace('_', '-'), valor)
+                self.send_header('Content-Length', str(len(corpo) if tamanho is None else tamanho))
+                self.end_headers()
+                self.wfile.write(corpo if corte is None else corpo[:corte])
+                if (corte is not None) or ((tamanho is not None) and (tamanho != len(corpo))):
+                    self.close_connection = True
+
+            def do_GET(self):
+                caminho = self.path.strip('/')
+                intervalo = self.headers.get('Range')
+                pedidos.setdefault(caminho, []).append((intervalo, self.headers.get('Accept-Encoding')))
+                primeiro = len(pedidos[caminho]) == 1
+                inicio = int(re.match(r'bytes=(\d+)-', intervalo).group(1)) if intervalo else 0
+                codigo = 206 if intervalo else 200
+                faixa = {'Content_Range': 'bytes {}-{}/{}'.format(inicio, len(DADOS) - 1, len(DADOS))} \
+                    if intervalo else {}
+
+                if caminho == 'ausente':
+                    return self._envia(404, b'')
+                if (caminho == 'instavel') and primeiro:
+                    return self._envia(503, b'')
+                if caminho == 'gzip':
+                    corpo = gzip.compress(DADOS[inicio:])
+                    return self._envia(codigo, corpo, corte=(len(corpo) // 2) if primeiro else None,
+                                       Content_Encoding='gzip', **faixa)
+                if (caminho == 'trecho') and intervalo:
+                    return self._envia(206, DADOS, Content_Range='bytes 0-{}/{}'.format(len(DADOS) - 1, len(DADOS)))
+                if caminho == 'completo':
+                    if intervalo and (inicio >= len(DADOS)):
+                        return self._envia(416, b'', Content_Range='bytes */{}'.format(len(DADOS)))
+                    return self._envia(codigo, DADOS[inicio:], tamanho=(len(DADOS) + 10) if primeiro else None,
+                                       **faixa)
+                return self._envia(codigo, DADOS[inicio:], corte=CORTE if primeiro else None, **faixa)
+
+        return Tratador
+
+
+@pytest.fixture
+def servidor(monkeypatch) -> ServidorInstavel:
+    # Blocks smaller than the documents, so an interruption happens after some of them were written
+    monkeypatch.setattr(downloads, 'tamanho_bloco', BLOCO)
+    monkeypatch.setattr(downloads, 'espera_inicial', 0.01)
+    monkeypatch.setattr(downloads, 'timeout', (5, 5))
+    servidor = ServidorInstavel()
+    yield servidor
+    servidor.encerra()
+
+
+def baixa(servidor:ServidorInstavel, caminho:str) -> bytes:
+    with downloads.baixa_arquivo(servidor.url(caminho)) as arquivo:
+        return arquivo.read()
+
+
+# TESTS
+#######################################################################################################################
+
+
+def test_retomada(servidor):
+    # The resume asks only for the rest of the document, from the last whole block written
+    assert baixa(servidor, 'simples') == DADOS
+    recebido = (CORTE // BLOCO) * BLOCO
+    assert servidor.pedidos['simples'] == [(None, 'identity'), ('bytes={}-'.format(recebido), 'identity')]
+
+
+def test_compressao_recomeca_do_zero(servidor):
+    # The bytes received were decompressed, and do not match the ranges of the server: no resume
+    assert baixa(servidor, 'gzip') == DADOS
+    assert servidor.pedidos['gzip'] == [(None, 'identity'), (None, 'identity')]
+
+
+def test_trecho_inesperado_recomeca_do_zero(servidor):
+    assert baixa(servidor, 'trecho') == DADOS
+    recebido = (CORTE // BLOCO) * BLOCO
+    assert [intervalo for intervalo, _ in servidor.pedidos['trecho']] == [None, 'bytes={}-'.format(recebido), None]
+
+
+def test_retomada_recusada_de_documento_completo(servidor):
+    # The whole document was received before the interruption: the 416 (with the same total size) ends the download
+    assert baixa(servidor, 'completo') == DADOS
+    assert servidor.pedidos['completo'] == [(None, 'identity'), ('bytes={}-'.format(len(DADOS)), 'identity')]
+
+
+def test_status_transitorio(servidor):
+    assert baixa(servidor, 'instavel') == DADOS
+    assert len(servidor.pedidos['instavel']) == 2
+
+
+def test_status_definitivo(servidor):
+    with pytest.raises(requests.HTTPError):
+        baixa(servidor, 'ausente')
+    assert len(servidor.pedidos['ausente']) == 1
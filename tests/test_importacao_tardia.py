@@ -0,0 +1,48 @@
+
+
+# STDLib
+import sys
+import subprocess
+
+# PIP
+import pytest
+
+
+# UTILS
+#######################################################################################################################
+
+
+def executa(codigo:str) -> str:
+    # A fresh interpreter, as the modules already imported by other tests would hide missing lazy imports
+    return subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True).stdout.strip()
+
+
+# TESTS
+#######################################################################################################################
+
+
+@pytest.mark.parametrize('caminho', [
+    'py_financas.sinacor.types.NotaCorretagem',
+    'py_financas.sinacor.parser.iter_pages',
+    'py_financas.sinacor.positions.parse_posicoes',
+    'py_financas.sinacor.cache.PageCache',
+    'py_financas.sinacor.instrumentation.Instrumentation',
+    'py_financas.sinacor.vectorized.parse_posicoes_vetorizadas',
+    'py_financas.constantes.relogio',
+    'py_financas.cvm.recupera_cadastros_fundos.recupera_cadastros',
+    'py_financas.bcb_sgs.armazem_series.ArmazemSeriesSGS',
+])
+def test_submodulos_apos_import_do_pacote(caminho):
+    assert executa(f'import py_financas; print(repr({caminho}) != "")') == 'True'
+
+
+def test_importacao_tardia():
+    # Importing the package does not import the sub-packages, nor their heavy dependencies
+    carregados = executa('import sys, py_financas; '
+                         'print(sorted(m for m in sys.modules if m.startswith(("py_financas.", "pandas", "pdfplumber"))))')
+    assert carregados == "['py_financas._importacao_tardia']"
+
+
+@pytest.mark.parametrize('nome', ['nao_existe', '__wrapped__', 'types.NotaCorretagem'])
+def test_nome_desconhecido(nome):
+    assert executa(f'import py_financas; print(hasattr(py_financas.sinacor, {nome!r}))') == 'False'
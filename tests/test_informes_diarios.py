@@ -0,0 +1,72 @@
+
+
+# STDLib
+import io
+import zipfile
+import tempfile
+from datetime import date
+
+# PIP
+import pandas as pd
+import pytest
+
+# This package
+from py_financas import _utils
+from py_financas.cvm import recupera_informes_diarios
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+INFORME = ('<INFORME_DIARIO><CNPJ_FDO>00.017.024/0001-53</CNPJ_FDO><DT_COMPTC>{data}</DT_COMPTC>'
+           '<VL_TOTAL>1.234,56</VL_TOTAL><VL_QUOTA>27,5</VL_QUOTA><PATRIM_LIQ>1.000,00</PATRIM_LIQ>'
+           '<CAPTC_DIA>0,00</CAPTC_DIA><RESG_DIA>10,00</RESG_DIA><NR_COTST>12</NR_COTST></INFORME_DIARIO>')
+
+
+# UTILS
+#######################################################################################################################
+
+
+class SessaoFalsa():
+    # Stand-in for the CVM session: the "URL" of each day is the date itself
+    def cliente(self): pass
+    def chama(self, operacao, codigo, data, justificativa):
+        assert operacao == 'solicAutorizDownloadArqEntregaPorData'
+        return data
+
+
+def baixa_informes(url:str) -> tempfile.SpooledTemporaryFile:
+    # As returned by baixa_arquivo: a zip with the informes of the day, in a spooled temporary file
+    xml = '<ROOT><INFORMES>{}</INFORMES></ROOT>'.format(INFORME.format(data=url) * 2)
+    arquivo = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    with zipfile.ZipFile(arquivo, 'w') as arquivo_zip:
+        arquivo_zip.writestr('informes.xml', xml)
+    arquivo.seek(0)
+    return arquivo
+
+
+def sem_atributo(arquivo):
+    raise AttributeError('seekable')
+
+
+# TESTS
+#######################################################################################################################
+
+
+@pytest.mark.parametrize('sem_seekable', [False, True], ids=['atual', 'python_3_10'])
+def test_recupera_informes_diarios_de_downloads_spooled(monkeypatch, tmp_path, sem_seekable):
+    monkeypatch.setattr(_utils, 'obtem_sessao_cvm', lambda usuario, senha: SessaoFalsa())
+    monkeypatch.setattr(_utils, 'baixa_arquivo', baixa_informes)
+    if sem_seekable:
+        monkeypatch.setattr(tempfile.SpooledTemporaryFile, 'seekable', property(sem_atributo), raising=False)
+
+    # 2024-01-01 is a holiday, and 2024-01-06/07 a weekend
+    informes = recupera_informes_diarios('usuario', 'senha', date(2024, 1, 1), date(2024, 1, 8), max_workers=2)
+    assert informes['DT_COMPTC'].dt.date.tolist() == [date(2024, 1, d) for d in (2, 2, 3, 3, 4, 4, 5, 5, 8, 8)]
+    assert informes['VL_TOTAL'].tolist() == [1234.56] * 10
+    assert informes['CNPJ_FDO'].unique().tolist() == ['00017024000153']
+
+    arquivos = recupera_informes_diarios('usuario', 'senha', date(2024, 1, 2), date(2024, 1, 3),
+                                         diretorio_saida=str(tmp_path / 'saida'))
+    assert [len(pd.read_csv(arquivo)) for arquivo in arquivos] == [2, 2]
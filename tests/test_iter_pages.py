@@ -0,0 +1,79 @@
+
+
+# STDLib
+import gc
+import weakref
+
+# This package
+from py_financas.sinacor import parser
+from py_financas.sinacor.cache import PageCache
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+PAGINAS = {'nota_a.pdf': ['a1', 'a2', 'a3'], 'nota_b.pdf': ['b1']}
+
+
+# UTILS
+#######################################################################################################################
+
+
+class Texto(str):
+    # A str that can be weakly referenced, to check whether someone else kept the page text
+    __slots__ = ('__weakref__',)
+
+
+class PaginaFalsa():
+    def __init__(self, texto:str): self.texto = texto
+    def extract_text(self) -> str: return Texto(self.texto)
+    def flush_cache(self): pass
+
+
+class PDFFalso():
+    def __init__(self, filename:str): self.pages = [PaginaFalsa(texto) for texto in PAGINAS[filename]]
+    def __enter__(self): return self
+    def __exit__(self, *args): pass
+
+
+def arquivos(tmp_path) -> list:
+    # Real files, as the cache keys are hashes of their contents
+    nomes = []
+    for nome in PAGINAS:
+        (tmp_path / nome).write_bytes(nome.encode())
+        nomes.append(str(tmp_path / nome))
+    return nomes
+
+
+def abre_pdf_falso(filename:str) -> PDFFalso:
+    return PDFFalso(filename.rsplit('/', 1)[-1])
+
+
+# TESTS
+#######################################################################################################################
+
+
+def test_iter_pages_sem_cache(monkeypatch, tmp_path):
+
+    # Without a cache, the text of the pages already read is not kept
+    monkeypatch.setattr(parser.pdfplumber, 'open', abre_pdf_falso)
+    paginas = parser.iter_pages(arquivos(tmp_path))
+    referencia = weakref.ref(next(paginas))
+    assert next(paginas) == 'a2'
+    gc.collect()
+    assert referencia() is None
+    assert list(paginas) == ['a3', 'b1']
+
+
+def test_iter_pages_com_cache(monkeypatch, tmp_path):
+
+    # With a cache, each file is extracted once and cached whole, then read back from the cache
+    monkeypatch.setattr(parser.pdfplumber, 'open', abre_pdf_falso)
+    cache = PageCache(str(tmp_path / 'cache'))
+    nomes = arquivos(tmp_path)
+    assert list(parser.iter_pages(nomes, cache)) == ['a1', 'a2', 'a3', 'b1']
+    assert [cache.get(cache.key(nome)) for nome in nomes] == list(PAGINAS.values())
+
+    monkeypatch.setattr(parser.pdfplumber, 'open', None)
+    assert list(parser.iter_pages(nomes, cache)) == ['a1', 'a2', 'a3', 'b1']
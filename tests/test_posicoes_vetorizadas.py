@@ -0,0 +1,102 @@
+
+
+# STDLib
+import os
+import sys
+from datetime import timedelta
+
+# PIP
+import pandas as pd
+import pytest
+
+# This package
+from py_financas.sinacor import parser
+from py_financas.sinacor.instrumentation import Instrumentation
+from py_financas.sinacor.types import Operacao
+from py_financas.sinacor.positions import _agrupa_operacoes, parse_posicoes_de_operacoes
+from py_financas.sinacor.vectorized import parse_posicoes_vetorizadas, posicoes_para_dataframe
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from sintetico import gera_paginas
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+# Both engines round the average cost and the realized gains at the same points, so every column must match exactly
+COLUNAS = ['corretora', 'titulo', 'tipo_mercado', 'chave_titulo', 'especificacao_titulo', 'observacao_titulo',
+           'chave_operacao_abertura', 'data_abertura', 'data_fechamento', 'quantidade', 'valor_unitario',
+           'valor_total', 'rendimento', 'operacoes']
+
+
+# UTILS
+#######################################################################################################################
+
+
+def operacoes_sinteticas(notas:int, seed:int) -> dict:
+    # Operations of synthetic Notas de Corretagem, through the same parser stages of the real files
+    paginas = list(gera_paginas(notas, folhas=2, operacoes=8, seed=seed))
+    notas_corretagem, header_columns, _, footer_columns = parser._base_parse_notas_corretagem(paginas)
+    return _agrupa_operacoes(parser._group_notas_corretagem(notas_corretagem, header_columns, footer_columns))
+
+
+def copia_operacao(op:Operacao, **campos) -> Operacao:
+    valores = dict(
+        _nota_numero=op._nota_numero, _nota_data_pregao=op._nota_data_pregao,
+        _nota_corretora_cnpj=op._nota_corretora_cnpj, titulo=op.titulo, preco_ajuste=op.preco_ajuste,
+        quantidade=op.quantidade, valor_operacao_ajuste=op.valor_operacao_ajuste, compra_venda=op.compra_venda,
+        debito_credito=op.debito_credito, tipo_mercado=op.tipo_mercado, negociacao=op.negociacao,
+        especificacao_titulo=op.especificacao_titulo, observacao=op.observacao,
+    )
+    valores.update(campos)
+    return Operacao(**valores)
+
+
+def com_titulos_irregulares(operacoes:dict) -> dict:
+    # Titles outside the closed form of the vectorized engine, which must fall back to the object engine:
+    # a split (desdobramento) inside an open position, and a position opened by a sale
+    operacoes = {chave: list(ops) for chave, ops in operacoes.items()}
+    chave, ops = next(iter(operacoes.items()))
+    ops.insert(1, copia_operacao(ops[0], compra_venda='desdobramento', quantidade=0.0, preco_ajuste=2.0,
+                                 valor_operacao_ajuste=0.0))
+    abertura = copia_operacao(ops[0], titulo='VENDIDO', compra_venda='venda', debito_credito='credito')
+    fechamento = copia_operacao(abertura, compra_venda='compra', debito_credito='debito',
+                                _nota_data_pregao=abertura._nota_data_pregao + timedelta(days=1))
+    operacoes[(chave[0], abertura.chave_titulo)] = [abertura, fechamento]
+    return operacoes
+
+
+def compara(operacoes:dict):
+    objetos = posicoes_para_dataframe(parse_posicoes_de_operacoes(operacoes))
+    vetorizadas = parse_posicoes_vetorizadas(operacoes)
+
+    assert len(objetos) == len(vetorizadas)
+    pd.testing.assert_frame_equal(objetos[COLUNAS], vetorizadas[COLUNAS], check_dtype=False, check_exact=True)
+    assert objetos['fechamentos'].tolist() == vetorizadas['fechamentos'].tolist()
+    return objetos
+
+
+# TESTS
+#######################################################################################################################
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_equivalente_ao_motor_de_objetos(seed):
+    posicoes = compara(operacoes_sinteticas(300, seed))
+
+    # Both closed and still open positions (no data_fechamento) are covered
+    assert posicoes['data_fechamento'].isna().any()
+    assert posicoes['data_fechamento'].notna().any()
+
+
+def test_titulos_irregulares_no_motor_de_objetos():
+    operacoes = com_titulos_irregulares(operacoes_sinteticas(100, 3))
+    with Instrumentation() as medidas:
+        posicoes = compara(operacoes)
+    assert medidas.counters['titles_object_engine'] == 2
+    assert (posicoes['titulo'] == 'VENDIDO').any()
+
+
+def test_sem_operacoes():
+    assert len(parse_posicoes_vetorizadas({})) == 0
@@ -0,0 +1,130 @@
+
+
+# STDLib
+import sys
+import datetime
+
+# PIP
+import pandas as pd
+import pytest
+from suds import WebFault
+
+# This package
+from py_financas import constantes
+from py_financas.bcb_sgs import ArmazemSeriesSGS
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+# The module, as py_financas.bcb_sgs.recupera_indice is the function of the same name
+recupera_indice = sys.modules['py_financas.bcb_sgs.recupera_indice']
+
+# First date of each series in the stand-in service: CDI and SELIC
+INICIO_SERIES = {12: datetime.date(1986, 3, 4), 11: datetime.date(1986, 6, 4)}
+
+
+# UTILS
+#######################################################################################################################
+
+
+class FalhaSemValores(WebFault):
+    def __init__(self): Exception.__init__(self, 'Value(s) not found')
+
+
+class ServicoSGS():
+    # Stand-in for the SGS web service: every week day (but Christmas) has the value 0.1, from the first date of each
+    # series up to the last published day. The calls are recorded as (codes, start, end)
+    def __init__(self):
+        self.chamadas = []
+        self.ultima_publicacao = datetime.date.max
+
+    def getValoresSeriesXML(self, codigos, inicio, fim):
+        self.chamadas.append((tuple(codigos), inicio, fim))
+        inicio = datetime.datetime.strptime(inicio, '%d/%m/%Y').date()
+        fim = datetime.datetime.strptime(fim, '%d/%m/%Y').date()
+        series, algum_valor = [], False
+        for codigo in codigos:
+            itens = []
+            dia = max(inicio, INICIO_SERIES[codigo])
+            while dia <= min(fim, self.ultima_publicacao):
+                if (dia.weekday() < 5) and ((dia.month, dia.day) != (12, 25)):
+                    itens.append('<ITEM><DATA>{}</DATA><VALOR>0.1</VALOR></ITEM>'.format(dia.strftime('%d/%m/%Y')))
+                dia += datetime.timedelta(days=1)
+            algum_valor |= bool(itens)
+            series.append('<SERIE ID="{}">{}</SERIE>'.format(codigo, ''.join(itens)))
+        if not algum_valor:
+            raise FalhaSemValores()
+        return '<SERIES>{}</SERIES>'.format(''.join(series))
+
+
+class ClienteSGS():
+    def __init__(self, servico:ServicoSGS): self.service = servico
+
+
+@pytest.fixture
+def servico(monkeypatch) -> ServicoSGS:
+    servico = ServicoSGS()
+    monkeypatch.setattr(recupera_indice, '_cliente_bcb', lambda: ClienteSGS(servico))
+    monkeypatch.setattr(constantes, 'relogio', lambda: datetime.datetime(2024, 6, 10, 15, 30))
+    return servico
+
+
+# TESTS
+#######################################################################################################################
+
+
+@pytest.mark.parametrize('data_inicio', [datetime.date(2024, 6, 1), datetime.datetime(2024, 6, 1)],
+                         ids=['date', 'datetime'])
+def test_data_fim_padrao(servico, data_inicio):
+
+    # By default, the series are read up to the last business day (on the configured clock), whether the start is a
+    # date or a datetime
+    resultado = recupera_indice.recupera_indice(['CDI'], data_inicio)
+    assert servico.chamadas == [((12,), '01/06/2024', '10/06/2024')]
+    assert len(resultado) == 6
+
+
+def test_armazem(servico, tmp_path):
+
+    # With a store, the second identical call reads everything from it, with the same result as without a store
+    inicio, fim = datetime.datetime(1980, 1, 1), datetime.datetime(2020, 1, 10)
+    sem_armazem = recupera_indice.recupera_indice([12, 11], inicio, fim)
+    chamadas_sem_armazem = len(servico.chamadas)
+    armazem = str(tmp_path / 'series.sqlite3')
+
+    del servico.chamadas[:]
+    primeira = recupera_indice.recupera_indice([12, 11], inicio, fim, armazem=armazem)
+    assert len(servico.chamadas) == chamadas_sem_armazem
+    del servico.chamadas[:]
+    segunda = recupera_indice.recupera_indice([12, 11], inicio, fim, armazem=armazem)
+    assert servico.chamadas == []
+    pd.testing.assert_frame_equal(primeira, sem_armazem)
+    pd.testing.assert_frame_equal(segunda, sem_armazem)
+
+    # A longer period requests only the new days, for all the series at once
+    recupera_indice.recupera_indice([12, 11], inicio, datetime.datetime(2020, 1, 20), armazem=armazem)
+    assert servico.chamadas == [((12, 11), '11/01/2020', '20/01/2020')]
+
+    # Offline, the store is read without any request
+    del servico.chamadas[:]
+    offline = recupera_indice.recupera_indice([12, 11], inicio, fim, armazem=armazem, offline=True)
+    assert servico.chamadas == []
+    pd.testing.assert_frame_equal(offline, sem_armazem)
+
+
+def test_armazem_dias_recentes(servico, tmp_path):
+
+    # Recent days without values may not have been published yet: they are requested again on the next call, while
+    # the older ones (and the days before the start of the series) are not
+    servico.ultima_publicacao = datetime.date(2024, 6, 6)
+    armazem = str(tmp_path / 'series.sqlite3')
+    recupera_indice.recupera_indice([11], datetime.date(1986, 1, 1), armazem=armazem)
+    assert ArmazemSeriesSGS(armazem).intervalos(11) == [(datetime.date(1986, 1, 1), datetime.date(2024, 6, 6))]
+
+    del servico.chamadas[:]
+    servico.ultima_publicacao = datetime.date.max
+    resultado = recupera_indice.recupera_indice([11], datetime.date(1986, 1, 1), armazem=armazem)
+    assert servico.chamadas == [((11,), '07/06/2024', '10/06/2024')]
+    assert resultado.index[-1] == pd.Timestamp(2024, 6, 10)
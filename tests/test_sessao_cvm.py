@@ -0,0 +1,242 @@
+
+
+# STDLib
+import re
+import itertools
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# PIP
+import pytest
+from suds import WebFault
+
+# This package
+from py_financas import constantes, _utils
+from py_financas._utils.autenticacao import e_falha_de_sessao
+
+
+# CONSTANTS
+#######################################################################################################################
+
+
+NS = 'http://www.cvm.gov.br/webservices/'
+
+# A minimal WSDL of the CVM system: the login (returning the session header) and one operation requiring it
+WSDL = f'''<?xml version="1.0" encoding="utf-8"?>
+<wsdl:definitions xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/" xmlns:s="http://www.w3.org/2001/XMLSchema"
+                  xmlns:tns="{NS}" targetNamespace="{NS}" xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/">
+<wsdl:types><s:schema elementFormDefault="qualified" targetNamespace="{NS}">
+  <s:element name="Login"><s:complexType><s:sequence>
+    <s:element minOccurs="0" name="iNrSist" type="s:int"/><s:element minOccurs="0" name="strSenha" type="s:string"/>
+  </s:sequence></s:complexType></s:element>
+  <s:element name="LoginResponse"><s:complexType/></s:element>
+  <s:element name="sessaoIdHeader" type="tns:sessaoIdHeader"/>
+  <s:complexType name="sessaoIdHeader"><s:sequence>
+    <s:element minOccurs="1" name="Guid" type="s:string"/><s:element minOccurs="1" name="IdSessao" type="s:int"/>
+  </s:sequence></s:complexType>
+  <s:element name="solicAutorizDownloadCadastro"><s:complexType><s:sequence>
+    <s:element minOccurs="0" name="strDtRefer" type="s:string"/>
+    <s:element minOccurs="0" name="strMotivoAutorizacaoDownload" type="s:string"/>
+  </s:sequence></s:complexType></s:element>
+  <s:element name="solicAutorizDownloadCadastroResponse"><s:complexType><s:sequence>
+    <s:element minOccurs="0" name="solicAutorizDownloadCadastroResult" type="s:string"/>
+  </s:sequence></s:complexType></s:element>
+</s:schema></wsdl:types>
+<wsdl:message name="LoginSoapIn"><wsdl:part name="parameters" element="tns:Login"/></wsdl:message>
+<wsdl:message name="LoginSoapOut"><wsdl:part name="parameters" element="tns:LoginResponse"/></wsdl:message>
+<wsdl:message name="LoginHeader"><wsdl:part name="sessaoIdHeader" element="tns:sessaoIdHeader"/></wsdl:message>
+<wsdl:message name="CadastroIn"><wsdl:part name="parameters" element="tns:solicAutorizDownloadCadastro"/></wsdl:message>
+<wsdl:message name="CadastroOut">
+  <wsdl:part name="parameters" element="tns:solicAutorizDownloadCadastroResponse"/>
+</wsdl:message>
+<wsdl:message name="CadastroHeader"><wsdl:part name="sessaoIdHeader" element="tns:sessaoIdHeader"/></wsdl:message>
+<wsdl:portType name="WsSoap">
+  <wsdl:operation name="Login"><wsdl:input message="tns:LoginSoapIn"/><wsdl:output message="tns:LoginSoapOut"/>
+  </wsdl:operation>
+  <wsdl:operation name="solicAutorizDownloadCadastro">
+    <wsdl:input message="tns:CadastroIn"/><wsdl:output message="tns:CadastroOut"/>
+  </wsdl:operation>
+</wsdl:portType>
+<wsdl:binding name="WsSoap" type="tns:WsSoap"><soap:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+  <wsdl:operation name="Login"><soap:operation soapAction="{NS}Login" style="document"/>
+    <wsdl:input><soap:body use="literal"/></wsdl:input>
+    <wsdl:output><soap:body use="literal"/>
+      <soap:header message="tns:LoginHeader" part="sessaoIdHeader" use="literal"/></wsdl:output>
+  </wsdl:operation>
+  <wsdl:operation name="solicAutorizDownloadCadastro">
+    <soap:operation soapAction="{NS}solicAutorizDownloadCadastro" style="document"/>
+    <wsdl:input><soap:body use="literal"/>
+      <soap:header message="tns:CadastroHeader" part="sessaoIdHeader" use="literal"/></wsdl:input>
+    <wsdl:output><soap:body use="literal"/></wsdl:output>
+  </wsdl:operation>
+</wsdl:binding>
+<wsdl:service name="Ws"><wsdl:port name="WsSoap" binding="tns:WsSoap">
+  <soap:address location="http://127.0.0.1:{{porta}}/ws"/>
+</wsdl:port></wsdl:service>
+</wsdl:definitions>'''
+
+ENVELOPE = ('<?xml version="1.0" encoding="utf-8"?>'
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">{}<soap:Body>{}</soap:Body>'
+            '</soap:Envelope>')
+
+FALHA = '<soap:Fault><faultcode>{}</faultcode><faultstring>{}</faultstring></soap:Fault>'
+
+
+# UTILS
+#######################################################################################################################
+
+
+class ServidorCVM():
+    """
+    Stand-in for the WSDL system of the CVM. Each login opens a new session, and closes the previous ones.
+    Calls with a closed session fail with "Sessao expirada", and the reference date 'invalida' fails with a fault
+    unrelated to the session
+    """
+
+    def __init__(self):
+        self.logins = 0
+        self.chamadas = 0
+        self.sessoes_validas = set()
+        self.rejeita_sessoes = False
+        self._contador = itertools.count(1)
+        self._trava = threading.Lock()
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), self._tratador())
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+
+    @property
+    def wsdl(self) -> str: return 'http://127.0.0.1:{}/ws?WSDL'.format(self._servidor.server_port)
+
+    def expira_sessoes(self):
+        self.sessoes_validas = set()
+
+    def encerra(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def _responde(self, corpo:str):
+
+        # Login: a new session, returned in the header
+        if ('Login>' in corpo) and ('solicAutoriz' not in corpo):
+            with self._trava:
+                self.logins += 1
+                sessao = next(self._contador)
+                self.sessoes_validas = {sessao}
+            cabecalho = (f'<soap:Header><sessaoIdHeader xmlns="{NS}"><Guid>g</Guid><IdSessao>{sessao}</IdSessao>'
+                         f'</sessaoIdHeader></soap:Header>')
+            return 200, ENVELOPE.format(cabecalho, f'<LoginResponse xmlns="{NS}"/>')
+
+        # Operations: the session is checked before the parameters
+        with self._trava:
+            self.chamadas += 1
+        sessao = re.search(r'IdSessao>(\d+)<', corpo)
+        if self.rejeita_sessoes or (sessao is None) or (int(sessao.group(1)) not in self.sessoes_validas):
+            return 500, ENVELOPE.format('', FALHA.format('soap:Server', 'Sessao expirada'))
+        data = re.search(r'strDtRefer>([^<]*)<', corpo).group(1)
+        if data == 'invalida':
+            return 500, ENVELOPE.format('', FALHA.format('soap:Client', 'Data de referencia invalida'))
+        return 200, ENVELOPE.format('', (f'<solicAutorizDownloadCadastroResponse xmlns="{NS}">'
+                                         f'<solicAutorizDownloadCadastroResult>http://x/{data}'
+                                         f'</solicAutorizDownloadCadastroResult></solicAutorizDownloadCadastroResponse>'))
+
+    def _tratador(self):
+        servidor_cvm = self
+
+        class Tratador(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass
+
+            def _envia(self, codigo:int, corpo:str):
+                corpo = corpo.encode()
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'text/xml; charset=utf-8')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_GET(self):
+                self._envia(200, WSDL.replace('{porta}', str(self.server.server_port)))
+
+            def do_POST(self):
+                self._envia(*servidor_cvm._responde(self.rfile.read(int(self.headers['Content-Length'])).decode()))
+
+        return Tratador
+
+
+@pytest.fixture
+def servidor(monkeypatch, tmp_path) -> ServidorCVM:
+    servidor = ServidorCVM()
+    monkeypatch.setattr(constantes, 'wsdl_cvm', servidor.wsdl)
+    monkeypatch.setattr(constantes, 'diretorio_cache_wsdl', str(tmp_path))
+    yield servidor
+    servidor.encerra()
+
+
+def solicita(sessao:_utils.SessaoCVM, data:str) -> str:
+    return sessao.chama('solicAutorizDownloadCadastro', data, 'teste')
+
+
+# TESTS
+#######################################################################################################################
+
+
+def test_falha_de_sessao_refaz_login_uma_vez(servidor):
+    sessao = _utils.SessaoCVM(1, 'senha')
+    assert solicita(sessao, '2024-01-02') == 'http://x/2024-01-02'
+    assert (servidor.logins, servidor.chamadas) == (1, 1)
+
+    # The session expires: the call fails, and is repeated once after a new login
+    servidor.expira_sessoes()
+    assert solicita(sessao, '2024-01-03') == 'http://x/2024-01-03'
+    assert (servidor.logins, servidor.chamadas) == (2, 3)
+
+
+def test_falha_de_sessao_persistente(servidor):
+    sessao = _utils.SessaoCVM(1, 'senha')
+    solicita(sessao, '2024-01-02')
+
+    # If the call fails again after the new login, the fault is raised (no further logins)
+    servidor.rejeita_sessoes = True
+    with pytest.raises(WebFault, match='Sessao expirada'):
+        solicita(sessao, '2024-01-03')
+    assert (servidor.logins, servidor.chamadas) == (2, 3)
+
+
+def test_outras_falhas_sao_repassadas(servidor):
+    sessao = _utils.SessaoCVM(1, 'senha')
+    solicita(sessao, '2024-01-02')
+
+    # Faults unrelated to the session are raised at once: no new login, no repeated call
+    with pytest.raises(WebFault, match='Data de referencia invalida'):
+        solicita(sessao, 'invalida')
+    assert (servidor.logins, servidor.chamadas) == (1, 2)
+    assert solicita(sessao, '2024-01-03') == 'http://x/2024-01-03'
+    assert servidor.logins == 1
+
+
+def test_e_falha_de_sessao():
+    assert e_falha_de_sessao(Exception('Sessao expirada'))
+    assert e_falha_de_sessao(Exception('Guid invalido'))
+    assert not e_falha_de_sessao(Exception('Data de referencia invalida'))
+
+
+def test_login_compartilhado_entre_threads(servidor):
+
+    # Each thread uses its own client, all with the headers of a single login, renewed once when the session expires
+    sessao = _utils.SessaoCVM(1, 'senha')
+    inicio = threading.Barrier(4)
+    resultados, falhas = [], []
+
+    def trabalha(indice):
+        try:
+            inicio.wait()
+            resultados.append(solicita(sessao, f'2024-01-0{indice + 1}'))
+        except Exception as exp:
+            falhas.append(exp)
+
+    for rodada in range(2):
+        threads = [threading.Thread(target=trabalha, args=(indice,)) for indice in range(4)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        servidor.expira_sessoes()
+    assert falhas == []
+    assert sorted(resultados) == sorted([f'http://x/2024-01-0{indice + 1}' for indice in range(4)] * 2)
+    assert servidor.logins == 2
@@ -0,0 +1,71 @@
+
+
+# STDLib
+import math
+
+# PIP
+import numpy as np
+import pandas as pd
+import pytest
+
+# This package
+from py_financas import _utils
+
+
+# UTILS
+#######################################################################################################################
+
+
+def como_lista(serie:pd.Series) -> list:
+    # NaN != NaN, so nulls are compared as None
+    return [None if (isinstance(valor, float) and math.isnan(valor)) else valor for valor in serie.tolist()]
+
+
+# TESTS
+#######################################################################################################################
+
+
+def test_normaliza_numerico_strings():
+    serie = pd.Series(['1.234,56', '2,5', '10', '0,001', '-3,25'])
+    assert _utils.normaliza_numerico_serie(serie).tolist() == [1234.56, 2.5, 10.0, 0.001, -3.25]
+
+
+def test_normaliza_numerico_mista():
+    # Numbers in object columns are real numbers, and are kept as they are. Only strings are converted
+    serie = pd.Series([1.5, None, '2,5', 3, np.float64(4.25), '1.000,5'], dtype=object)
+    resultado = _utils.normaliza_numerico_serie(serie)
+    assert resultado.dtype == np.float64
+    assert como_lista(resultado) == [1.5, None, 2.5, 3.0, 4.25, 1000.5]
+
+
+def test_normaliza_numerico_mantem_indice():
+    serie = pd.Series(['1,5', 2], index=[10, 20], name='VL_QUOTA', dtype=object)
+    resultado = _utils.normaliza_numerico_serie(serie)
+    assert resultado.index.tolist() == [10, 20]
+    assert resultado.name == 'VL_QUOTA'
+
+
+def test_normaliza_numerico_numerica_e_vazia():
+    assert _utils.normaliza_numerico_serie(pd.Series([1, 2])).tolist() == [1, 2]
+    assert _utils.normaliza_numerico_serie(pd.Series([], dtype=object)).tolist() == []
+
+
+def test_normaliza_numerico_invalido():
+    with pytest.raises(ValueError):
+        _utils.normaliza_numerico_serie(pd.Series(['1,5', 'N/A']))
+
+
+def test_normaliza_cnpj_mista():
+    serie = pd.Series(['00.017.024/0001-53', None, 17024000153, '17.024.000/0001-53', '00.017.024/0001-53'],
+                      dtype=object)
+    resultado = _utils.normaliza_cnpj_serie(serie)
+    assert como_lista(resultado) == ['00017024000153', None, '00017024000153', '17024000000153', '00017024000153']
+
+
+def test_normaliza_cnpj_igual_ao_valor_a_valor():
+    serie = pd.Series(['{:02d}.{:03d}.{:03d}/0001-{:02d}'.format(i % 97, i % 991, i % 13, i % 89) for i in range(500)],
+                      index=range(1000, 1500), name='CNPJ_FDO')
+    resultado = _utils.normaliza_cnpj_serie(serie)
+    assert resultado.tolist() == serie.apply(_utils.normaliza_cnpj).tolist()
+    assert resultado.index.equals(serie.index)
+    assert resultado.name == 'CNPJ_FDO'